@@ -1,7 +1,9 @@
 from django.contrib import admin
 from django.db.models import QuerySet
 
+from account import cache
 from account.models import User
+from product.pagination import EstimatedCountPaginator
 
 
 @admin.register(User)
@@ -11,8 +13,11 @@ class UserAdmin(admin.ModelAdmin):
     list_editable = ['first_name', 'last_name', 'is_active']
     list_display_links = ['username']
     readonly_fields = ['username']
+    # Served by user_name_upper_trgm_idx.
     search_fields = ['username', 'first_name', 'last_name']
     list_filter = ['is_active', 'is_superuser']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (
             'General',
@@ -46,8 +51,14 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.action(description='Make admin')
     def make_admin(self, request, queryset):
-        queryset.update(is_superuser=True)
+        # The changelist filters may stop matching the updated rows, so take the ids first.
+        user_ids = list(queryset.values_list('pk', flat=True))
+        User.objects.filter(pk__in=user_ids).update(is_superuser=True)
+        # update() sends no signals, so invalidate the cached users by hand.
+        cache.invalidate_user(*user_ids)
 
     @admin.action(description='Make user clear')
     def make_user_clear(self, request, queryset: QuerySet[User]):
-        queryset.update(last_login=None, first_name='', last_name='')
+        user_ids = list(queryset.values_list('pk', flat=True))
+        User.objects.filter(pk__in=user_ids).update(last_login=None, first_name='', last_name='')
+        cache.invalidate_user(*user_ids)
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from account.models import User
+from product.cache import get_versions, bump_version
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+
+
+def user_scope(user_id) -> str:
+    return f'account.user:{user_id}'
+
+
+def _user_key(user_id) -> str:
+    [version] = get_versions([user_scope(user_id)])
+    return f'account:user:{user_id}:{version}'
+
+
+def get_user(user_id) -> User | None:
+    return cache.get(_user_key(user_id))
+
+
+def get_or_load_user(user_id, **lookup) -> User:
+    """
+    Return the cached user, loading it with `load_user(**lookup)` on a miss. The key is read before the
+    load, so a change committed meanwhile bumps past it instead of getting the stale user cached under
+    the new version.
+    """
+    key = _user_key(user_id)
+    if (user := cache.get(key)) is None:
+        user = load_user(**lookup)
+        cache.set(key, user, timeout=USER_CACHE_TIMEOUT)
+
+    return user
+
+
+def load_user(**lookup) -> User:
+    """Fetch a user with its favorite-ID set, which product listings use instead of an EXISTS subquery."""
+    user = User.objects.get(**lookup)
+    user.favorite_product_ids = frozenset(
+        User.favorite_products.through.objects.filter(user_id=user.pk).values_list('product_id', flat=True)
+    )
+    return user
+
+
+def invalidate_user(*user_ids) -> None:
+    for user_id in user_ids:
+        bump_version(user_scope(user_id))
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 17:10
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('account', '0002_user_favorite_products'),
+        # Installs pg_trgm.
+        ('product', '0008_product_search_vector'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['username', 'first_name', 'last_name'], name='user_name_trgm_idx', opclasses=['gin_trgm_ops', 'gin_trgm_ops', 'gin_trgm_ops']),
+        ),
+    ]
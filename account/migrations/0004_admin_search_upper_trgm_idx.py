@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 19:10
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('account', '0003_user_user_name_trgm_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='user',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('username', models.TextField())), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('first_name', models.TextField())), name='gin_trgm_ops'), django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('last_name', models.TextField())), name='gin_trgm_ops'), name='user_name_upper_trgm_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='user',
+            name='user_name_trgm_idx',
+        ),
+    ]
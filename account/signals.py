@@ -0,0 +1,25 @@
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from account import cache
+from account.models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance: User, **kwargs):
+    cache.invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.favorite_products.through)
+def invalidate_cached_favorites(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            cache.invalidate_user(instance.pk)
+        return
+
+    # From the product side pk_set holds user ids, except on clear, where the users are looked up first.
+    if action == 'pre_clear':
+        cache.invalidate_user(*sender.objects.filter(product_id=instance.pk).values_list('user_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        cache.invalidate_user(*pk_set)
+
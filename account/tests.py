@@ -1,3 +1,109 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.admin import site
+from django.core.cache import cache as django_cache
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account import cache
+from account.admin import UserAdmin
+from account.models import User
+from product.enums import ProductUnitEnum
+from product.models import Category, Product
+
+
+class CachedJWTAuthenticationTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password', first_name='Old')
+        category = Category.objects.create(title='Fruits', icon='', description='')
+        cls.products = [
+            Product.objects.create(
+                title=f'Product {index}', slug=f'product-{index}', description='', image='', price=100,
+                unit=ProductUnitEnum.ONE, quantity=10, category=category,
+            )
+            for index in range(3)
+        ]
+
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_user_is_loaded_once(self):
+        with self.assertNumQueries(3):
+            self.client.get('/api/shop/products/cart/')
+
+        # Only the cart query is left once the user and its favorite IDs are cached.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/shop/products/cart/')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_update_refreshes_the_cached_user(self):
+        self.client.get('/api/account/profile/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/api/account/profile/', {'first_name': 'New', 'last_name': 'Name'})
+
+        self.assertEqual(self.client.get('/api/account/profile/').data['first_name'], 'New')
+
+    def test_deactivation_takes_effect_immediately(self):
+        self.assertEqual(self.client.get('/api/account/profile/').status_code, 200)
+
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+
+        self.assertEqual(self.client.get('/api/account/profile/').status_code, 401)
+
+    def test_change_committed_during_a_load_is_not_hidden(self):
+        load_user = cache.load_user
+
+        def load_then_deactivate(**lookup):
+            user = load_user(**lookup)
+            # Another request deactivates the user after the row was read but before it is cached.
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.filter(pk=self.user.pk).update(is_active=False)
+                cache.invalidate_user(self.user.pk)
+            return user
+
+        with mock.patch('account.cache.load_user', load_then_deactivate):
+            self.assertEqual(self.client.get('/api/account/profile/').status_code, 200)
+
+        self.assertEqual(self.client.get('/api/account/profile/').status_code, 401)
+
+    def test_admin_actions_refresh_the_cached_user(self):
+        self.client.get('/api/account/profile/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAdmin(User, site).make_admin(None, User.objects.filter(pk=self.user.pk))
+        self.assertIsNone(cache.get_user(self.user.pk))
+
+        self.client.get('/api/account/profile/')
+        self.assertTrue(cache.get_user(self.user.pk).is_superuser)
+
+    def test_admin_actions_invalidate_rows_that_leave_the_filter(self):
+        self.client.get('/api/account/profile/')
+
+        # The action's queryset is filtered on a field the action itself changes.
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAdmin(User, site).make_user_clear(None, User.objects.filter(first_name='Old'))
+
+        self.assertIsNone(cache.get_user(self.user.pk))
+        self.assertEqual(self.client.get('/api/account/profile/').data['first_name'], '')
+
+    def test_favorite_ids_follow_favorite_changes(self):
+        self.user.favorite_products.add(self.products[0])
+        self.client.get('/api/shop/products/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/shop/products/favorites/{self.products[1].id}/')
+            self.client.delete(f'/api/shop/products/favorites/{self.products[0].id}/')
+        self.client.get('/api/account/profile/')
+
+        # Fingerprint and list only: the user and its favorite IDs come from the cache.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/shop/products/')
+
+        favorites = {item['id'] for item in response.data if item['is_user_favorite']}
+        self.assertEqual(favorites, {self.products[1].id})
@@ -1,24 +1,66 @@
 from django.contrib import admin
 
-from product.models import Category, Product, Cart, CartItem
+from product.models import Category, Product, Cart, CartItem, Order, OrderLine
+from product.mixins import ExactSearchMixin
+from product.pagination import EstimatedCountPaginator
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ['id', 'title']
+    search_fields = ['title']
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['id', 'title', 'category']
+    list_display = ['id', 'title', 'category', 'price', 'quantity']
+    list_select_related = ['category']
+    # Served by product_category_price_idx and product_title_upper_trgm_idx.
     list_filter = ['category']
+    search_fields = ['title']
+    autocomplete_fields = ['category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
-    pass
+class CartAdmin(ExactSearchMixin, admin.ModelAdmin):
+    list_display = ['id', 'user', 'status', 'created_at', 'updated_at']
+    list_select_related = ['user']
+    # Served by cart_status_updated_idx and, with ExactSearchMixin, the unique username index.
+    list_filter = ['status']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
-    pass
+class CartItemAdmin(ExactSearchMixin, admin.ModelAdmin):
+    list_display = ['id', 'cart', 'cart_user', 'product', 'quantity']
+    list_select_related = ['cart__user', 'product']
+    search_fields = ['cart__id', 'cart__user__username']
+    raw_id_fields = ['cart', 'product']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @admin.display(description='User', ordering='cart__user__username')
+    def cart_user(self, obj: CartItem):
+        return obj.cart.user
+
+
+class OrderLineInline(admin.TabularInline):
+    model = OrderLine
+    raw_id_fields = ['product']
+    extra = 0
+
+
+@admin.register(Order)
+class OrderAdmin(ExactSearchMixin, admin.ModelAdmin):
+    list_display = ['id', 'user', 'item_count', 'total_price', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['user__username']
+    raw_id_fields = ['user', 'cart']
+    inlines = [OrderLineInline]
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from product.async_views import AsyncCategoriesView, AsyncProductListView, AsyncCartView
+
+urlpatterns = [
+    path('categories/', AsyncCategoriesView.as_view()),
+    path('products/', AsyncProductListView.as_view()),
+    path('products/cart/', AsyncCartView.as_view()),
+]
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotAuthenticated, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from account.authentication import AsyncJWTAuthentication
+from product.models import Category
+from product.serializers import CategorySerializer, ProductSerializer, CartSerializer
+from product.views import CustomPagination, ProductListView, CartView
+
+
+class AsyncAPIView(View):
+    """
+    Async-native counterpart of the DRF read views. Authentication and every query are awaited;
+    serialization reuses the DRF serializers, which only touch already-loaded rows.
+    """
+    authentication = AsyncJWTAuthentication()
+    authentication_required = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authentication.aauthenticate(request)
+            request.user = result[0] if result else AnonymousUser()
+
+            if self.authentication_required and request.user.is_anonymous:
+                raise NotAuthenticated()
+
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as error:
+            data = error.detail if isinstance(error.detail, (list, dict)) else {'detail': error.detail}
+            return self.render(data, status=error.status_code)
+
+    @staticmethod
+    def render(data, status=200) -> HttpResponse:
+        return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+class AsyncCategoriesView(AsyncAPIView):
+    async def get(self, request):
+        categories = [category async for category in Category.objects.all()]
+        return self.render(CategorySerializer(categories, many=True).data)
+
+
+class AsyncProductListView(AsyncAPIView):
+    async def get(self, request):
+        drf_request = Request(request)
+        drf_request.user = request.user
+
+        # The sync view's filter backends only build the queryset, so they are safe to reuse here.
+        view = ProductListView(request=drf_request, format_kwarg=None, args=(), kwargs={})
+        queryset = view.filter_queryset(view.get_queryset())
+
+        page_size = CustomPagination().get_page_size(drf_request)
+        if page_size is None:
+            products = [product async for product in queryset]
+            return self.render(ProductSerializer(products, many=True, context=view.get_serializer_context()).data)
+
+        try:
+            page = int(drf_request.query_params.get(CustomPagination.page_query_param, 1))
+        except ValueError:
+            raise NotFound('Invalid page.')
+
+        count = await queryset.acount()
+        offset = (page - 1) * page_size
+        if page < 1 or (page > 1 and offset >= count):
+            raise NotFound('Invalid page.')
+
+        products = [product async for product in queryset[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+
+        return self.render({
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if offset + page_size < count else None,
+            'previous': (
+                None if page == 1
+                else remove_query_param(url, 'page') if page == 2
+                else replace_query_param(url, 'page', page - 1)
+            ),
+            'results': ProductSerializer(products, many=True, context=view.get_serializer_context()).data,
+        })
+
+
+class AsyncCartView(AsyncAPIView):
+    authentication_required = True
+
+    async def get(self, request):
+        cart_items = [cart_item async for cart_item in CartView.get_cart_items(request.user)]
+        serializer = CartSerializer(CartView.summarize(cart_items), context={'request': request})
+        return self.render(serializer.data)
@@ -0,0 +1,114 @@
+import hashlib
+import time
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Model
+from django.utils.http import urlencode
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from shoppy_zone.routers import used_replica
+
+CATALOG_CACHE_TIMEOUT = getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+REPLICA_MAX_LAG = getattr(settings, 'DATABASE_REPLICA_MAX_LAG', 5)
+
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+Scope = type[Model] | str
+
+
+def _scope_name(scope: Scope) -> str:
+    return scope if isinstance(scope, str) else scope._meta.label_lower
+
+
+def _version_key(scope: Scope) -> str:
+    return f'catalog:version:{_scope_name(scope)}'
+
+
+def _bumped_key(scope: Scope) -> str:
+    return f'catalog:bumped:{_scope_name(scope)}'
+
+
+def _incr(key: str, initial: int) -> None:
+    # incr is atomic on Redis; add() only seeds the counter when it is missing.
+    cache.add(key, initial, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial + 1, timeout=None)
+
+
+def get_versions(scopes: Iterable[Scope]) -> list[int]:
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+
+    for key in keys:
+        if key not in versions:
+            # Seed with a timestamp, so an evicted counter never reuses an old version.
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+
+    return [versions[key] for key in keys]
+
+
+def bump_version(scope: Scope) -> None:
+    """
+    Invalidate every page cached under `scope` once the current transaction commits (right away in
+    autocommit). Bumping earlier would let a concurrent reader cache the old rows under the new version.
+    """
+    def bump():
+        _incr(_version_key(scope), time.time_ns())
+        # Marks the scope as recently written for as long as a replica may still serve the old rows.
+        cache.set(_bumped_key(scope), True, timeout=REPLICA_MAX_LAG)
+
+    transaction.on_commit(bump)
+
+
+def recently_bumped(scopes: Iterable[Scope]) -> bool:
+    return bool(cache.get_many([_bumped_key(scope) for scope in scopes]))
+
+
+def normalize_query(request: Request) -> str:
+    return urlencode(sorted((key, sorted(values)) for key, values in request.query_params.lists()), doseq=True)
+
+
+def make_key(request: Request, scopes: Iterable[Scope]) -> str:
+    versions = '.'.join(str(version) for version in get_versions(scopes))
+    digest = hashlib.md5(normalize_query(request).encode()).hexdigest()
+    return f'catalog:{request.path}:{versions}:{digest}'
+
+
+def cached_response(request: Request, scopes: Iterable[Scope], get_response: Callable[[], Response]) -> Response:
+    key = make_key(request, scopes)
+
+    if (data := cache.get(key)) is not None:
+        _incr(HITS_KEY, 0)
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    _incr(MISSES_KEY, 0)
+    response = get_response()
+
+    # A lagging replica may still return the rows from before the bump, which would then be cached
+    # under the new version, so pages read from a replica right after a write are not stored.
+    if response.status_code == 200 and not (used_replica() and recently_bumped(scopes)):
+        cache.set(key, response.data, timeout=CATALOG_CACHE_TIMEOUT)
+    response['X-Cache'] = 'MISS'
+
+    return response
+
+
+def comments_scope(product_id: int) -> str:
+    return f'product.comment:{product_id}'
+
+
+def get_stats() -> dict[str, int]:
+    stats = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': stats.get(HITS_KEY, 0),
+        'misses': stats.get(MISSES_KEY, 0),
+    }
@@ -0,0 +1,86 @@
+import csv
+import json
+import zlib
+from datetime import datetime
+from typing import Iterable, Iterator
+
+from django.db.models import QuerySet
+
+EXPORT_FIELDS = (
+    'id', 'title', 'slug', 'description', 'image', 'price', 'unit', 'quantity', 'rate', 'rate_count', 'category_id',
+    'updated_at',
+)
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+BUFFER_SIZE = 64 * 1024
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def render_csv(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow([_isoformat(value) for value in row])
+
+
+def render_jsonl(rows: Iterable[tuple]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_FIELDS, row)), default=_isoformat) + '\n'
+
+
+def buffered(lines: Iterable[str]) -> Iterator[bytes]:
+    buffer, size = [], 0
+
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+
+        if size >= BUFFER_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzipped(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+
+    for chunk in chunks:
+        if data := compressor.compress(chunk):
+            yield data
+
+    yield compressor.flush()
+
+
+def export_products(queryset: QuerySet, output_format: str, chunk_size: int = 2_000, compress: bool = False):
+    """
+    Stream `queryset` as CSV or JSONL bytes. Rows come from `values_list().iterator()`, so no model
+    instances are built and memory stays flat regardless of catalog size.
+    """
+    if not queryset.query.order_by:
+        queryset = queryset.order_by('id')
+
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    lines = render_csv(rows) if output_format == 'csv' else render_jsonl(rows)
+    chunks = buffered(lines)
+
+    return gzipped(chunks) if compress else chunks
+
+
+def get_filename(output_format: str, compress: bool) -> str:
+    return f'products.{output_format}' + ('.gz' if compress else '')
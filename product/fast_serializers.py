@@ -0,0 +1,137 @@
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.storage import FileSystemStorage
+from django.db import models
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from product.models import Category, Product, CartItem
+from product.thumbnails import thumbnail_urls
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer over `.values()` rows, producing the same JSON as the matching `ModelSerializer`.
+
+    The per-field getters are compiled once per instance, so serializing a row is one dict comprehension
+    instead of DRF's field lookup and `to_representation` chain. `get_<field>(row)` methods work like
+    `SerializerMethodField`, and `sources` maps an output key to a different `values()` column.
+    """
+    model: type[models.Model]
+    fields: tuple[str, ...] = ()
+    sources: dict[str, str] = {}
+    extra_columns: tuple[str, ...] = ()
+
+    def __init__(self, instance=None, many=False, context=None):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.getters = [(name, self.build_getter(name)) for name in self.fields]
+
+    @classmethod
+    def get_columns(cls) -> list[str]:
+        columns = [cls.sources.get(name, name) for name in cls.fields if not hasattr(cls, f'get_{name}')]
+        return list(dict.fromkeys(columns + list(cls.extra_columns)))
+
+    @classmethod
+    def values(cls, queryset):
+        return queryset.values(*cls.get_columns())
+
+    def build_getter(self, name):
+        if method := getattr(self, f'get_{name}', None):
+            return method
+
+        column = self.sources.get(name, name)
+        get = itemgetter(column)
+
+        try:
+            field = self.model._meta.get_field(column)
+        except FieldDoesNotExist:
+            return get
+
+        if isinstance(field, models.ImageField):
+            get_url = self.get_url_builder(field.storage)
+            return lambda row: get_url(name) if (name := get(row)) else None
+
+        if isinstance(field, models.DateTimeField):
+            to_representation = self.get_datetime_representation()
+            return lambda row: None if (value := get(row)) is None else to_representation(value)
+
+        return get
+
+    def get_url_builder(self, storage):
+        """Same URLs as DRF's ImageField: absolute with a request in the context, storage-relative otherwise."""
+        request = self.context.get('request')
+
+        if isinstance(storage, FileSystemStorage):
+            # FileSystemStorage.url() is `base_url + filepath_to_uri(name)`; resolve the prefix once.
+            prefix = request.build_absolute_uri(storage.base_url) if request is not None else storage.base_url
+            return lambda name: prefix + filepath_to_uri(name).lstrip('/')
+
+        if request is None:
+            return storage.url
+
+        return lambda name: request.build_absolute_uri(storage.url(name))
+
+    @staticmethod
+    def get_datetime_representation():
+        if not settings.USE_TZ or str(api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+            return serializers.DateTimeField().to_representation
+
+        # DateTimeField.to_representation for aware values, without the per-call setting lookups.
+        current_timezone = timezone.get_current_timezone()
+
+        def to_representation(value):
+            value = value.astimezone(current_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+        return to_representation
+
+    def to_representation(self, row) -> dict:
+        return {name: get(row) for name, get in self.getters}
+
+    @property
+    def data(self):
+        if self.many:
+            return [self.to_representation(row) for row in self.instance]
+        return self.to_representation(self.instance)
+
+
+class ThumbnailsMixin:
+    """`thumbnails` as rendered by `ThumbnailsField(image_field)`."""
+    image_field: str
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.get_thumbnail_url = self.get_url_builder(self.model._meta.get_field(self.image_field).storage)
+
+    def get_thumbnails(self, row):
+        return thumbnail_urls(row['thumbnails'], row[self.image_field], self.get_thumbnail_url)
+
+
+class CategoryValuesSerializer(ThumbnailsMixin, ValuesSerializer):
+    model = Category
+    image_field = 'icon'
+    fields = ('id', 'thumbnails', 'title', 'icon', 'updated_at')
+    extra_columns = ('thumbnails',)
+
+
+class ProductValuesSerializer(ThumbnailsMixin, ValuesSerializer):
+    model = Product
+    image_field = 'image'
+    fields = (
+        'id', 'is_user_favorite', 'thumbnails', 'title', 'slug', 'image', 'price', 'unit', 'quantity', 'rate',
+        'rate_count', 'updated_at', 'category',
+    )
+    sources = {'category': 'category_id'}
+    extra_columns = ('thumbnails',)
+
+
+class CartItemDetailValuesSerializer(ValuesSerializer):
+    model = CartItem
+    fields = ('total_price', 'product', 'quantity')
+    sources = {'product': 'product_id'}
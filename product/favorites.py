@@ -0,0 +1,70 @@
+from django.db import connection
+from django.db.models import Exists, OuterRef
+
+from account import cache as user_cache
+from account.models import User
+from product.models import Product
+
+Favorite = User.favorite_products.through
+
+
+def add_favorite(user_id: int, product_id: int) -> bool:
+    """Insert one favorite in a single statement; False when the product is missing or already a favorite."""
+    table = connection.ops.quote_name(Favorite._meta.db_table)
+    products = connection.ops.quote_name(Product._meta.db_table)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, product_id) SELECT %s, id FROM {products} WHERE id = %s '
+            f'ON CONFLICT (user_id, product_id) DO NOTHING',
+            [user_id, product_id],
+        )
+        added = cursor.rowcount == 1
+
+    if added:
+        # Raw SQL sends no m2m_changed, so invalidate the cached user by hand.
+        user_cache.invalidate_user(user_id)
+
+    return added
+
+
+def remove_favorite(user_id: int, product_id: int) -> bool:
+    # The through model has no delete signals or dependents, so this is a single DELETE.
+    removed, _ = Favorite.objects.filter(user_id=user_id, product_id=product_id).delete()
+
+    if removed:
+        user_cache.invalidate_user(user_id)
+
+    return bool(removed)
+
+
+def sync_favorites(user_id: int, add: list[int], remove: list[int]) -> dict:
+    """Add and remove favorites in bulk; unknown product ids in `add` are skipped and reported."""
+    rows = Product.objects.filter(id__in=add).annotate(
+        is_favorite=Exists(Favorite.objects.filter(user_id=user_id, product_id=OuterRef('pk')))
+    ).values_list('id', 'is_favorite') if add else []
+    found = {product_id for product_id, _ in rows}
+    new = sorted(product_id for product_id, is_favorite in rows if not is_favorite)
+
+    # ignore_conflicts covers a concurrent request adding the same favorite in between.
+    created = Favorite.objects.bulk_create(
+        [Favorite(user_id=user_id, product_id=product_id) for product_id in new], ignore_conflicts=True,
+    )
+    removed, _ = Favorite.objects.filter(user_id=user_id, product_id__in=remove).delete() if remove else (0, None)
+
+    if created or removed:
+        user_cache.invalidate_user(user_id)
+
+    return {
+        'added': len(created),
+        'removed': removed,
+        'not_found': [product_id for product_id in add if product_id not in found],
+    }
+
+
+def get_favorite_ids(user: User) -> list[int]:
+    # Users resolved by CachedJWTAuthentication already carry the set.
+    if (favorite_ids := getattr(user, 'favorite_product_ids', None)) is not None:
+        return sorted(favorite_ids)
+
+    return list(Favorite.objects.filter(user_id=user.id).order_by('product_id').values_list('product_id', flat=True))
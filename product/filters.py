@@ -0,0 +1,71 @@
+from functools import reduce
+from operator import and_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, Q
+from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from product.models import Product
+
+
+class ProductFilterSet(filters.FilterSet):
+    category_id = filters.NumberFilter(field_name='category_id')
+    min_price = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    max_price = filters.NumberFilter(field_name='price', lookup_expr='lte')
+    in_stock = filters.BooleanFilter(method='filter_in_stock')
+
+    class Meta:
+        model = Product
+        fields = ['category_id', 'min_price', 'max_price', 'in_stock']
+
+    def filter_in_stock(self, queryset, name, value):
+        return queryset.filter(quantity__gt=0) if value else queryset
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Drop-in replacement for `SearchFilter` backed by the GIN-indexed `Product.search_vector`.
+
+    Every term is matched as a prefix, results are ordered by rank unless an explicit ordering was
+    applied, and `?fuzzy=true` also accepts titles containing a word trigram-similar to the search text.
+    """
+    search_config = 'english'
+    fuzzy_param = 'fuzzy'
+
+    def get_search_query(self, terms):
+        queries = [
+            SearchQuery(f"'{self.escape_term(term)}':*", config=self.search_config, search_type='raw')
+            for term in terms
+        ]
+        return reduce(and_, queries)
+
+    @staticmethod
+    def escape_term(term):
+        return term.replace('\\', '\\\\').replace("'", "''")
+
+    def is_fuzzy(self, request):
+        return request.query_params.get(self.fuzzy_param, '').lower() in ('1', 'true')
+
+    def filter_queryset(self, request, queryset, view):
+        return self.search(queryset, self.get_search_terms(request), self.is_fuzzy(request))
+
+    def search(self, queryset, terms, fuzzy=False):
+        if not terms:
+            return queryset
+
+        query = self.get_search_query(terms)
+        condition = Q(search_vector=query)
+        rank = SearchRank(F('search_vector'), query)
+
+        if fuzzy:
+            text = ' '.join(terms)
+            condition |= Q(title__trigram_word_similar=text)
+            rank = rank + TrigramWordSimilarity(text, 'title')
+
+        queryset = queryset.annotate(search_rank=rank).filter(condition)
+
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('-search_rank', 'id')
+
+        return queryset
@@ -0,0 +1,79 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+
+from product.models import Category
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the request lifecycle (request_started/finished close_old_connections, one catalog query) '
+        'from concurrent threads with CONN_MAX_AGE=0 and with persistent connections, and compare latency.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread.')
+        parser.add_argument('--max-age', type=int, default=60, help='CONN_MAX_AGE of the persistent run.')
+
+    def handle(self, *args, **options):
+        self.connects = 0
+        connection_created.connect(self.count_connect)
+
+        try:
+            for label, max_age, health_checks in (
+                ('new connection per request', 0, False),
+                (f'persistent (CONN_MAX_AGE={options["max_age"]}, health checks)', options['max_age'], True),
+            ):
+                self.connects = 0
+                latencies, elapsed = self.run(options['concurrency'], options['requests'], max_age, health_checks)
+                self.report(label, latencies, elapsed)
+        finally:
+            connection_created.disconnect(self.count_connect)
+
+    def count_connect(self, **kwargs):
+        self.connects += 1
+
+    def run(self, concurrency, requests, max_age, health_checks):
+        latencies = []
+        lock = threading.Lock()
+
+        def worker():
+            # Each thread owns its connection; give it the settings under test.
+            connection.settings_dict = {
+                **connection.settings_dict, 'CONN_MAX_AGE': max_age, 'CONN_HEALTH_CHECKS': health_checks,
+            }
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                close_old_connections()
+                list(Category.objects.values_list('id', 'title')[:20])
+                close_old_connections()
+                timings.append(time.perf_counter() - started)
+
+            connection.close()
+            with lock:
+                latencies.extend(timings)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return sorted(latencies), time.perf_counter() - started
+
+    def report(self, label, latencies, elapsed):
+        def ms(fraction):
+            return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+        self.stdout.write(
+            f'{label}: {len(latencies) / elapsed:.0f} req/s, {self.connects} connects, '
+            f'mean {statistics.mean(latencies) * 1000:.2f} ms, p50 {ms(0.50):.2f} ms, '
+            f'p95 {ms(0.95):.2f} ms, p99 {ms(0.99):.2f} ms'
+        )
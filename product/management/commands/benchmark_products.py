@@ -0,0 +1,127 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from product import cache
+from product.enums import ProductUnitEnum
+from product.models import Category, Product
+
+BENCH_PREFIX = 'bench-'
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed N products and report p50/p95 latency of the ProductListView filter/order combinations. '
+        'Run it before and after `migrate product 0009_product_hot_filter_indexes` to compare index plans.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100_000, help='Number of products to seed.')
+        parser.add_argument('--categories', type=int, default=20, help='Number of categories to seed.')
+        parser.add_argument('--iterations', type=int, default=50, help='Runs per combination.')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded rows after the run.')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('--iterations must be at least 2 to compute p95.')
+
+        self.random = random.Random(options['seed'])
+
+        categories = self.seed(options['count'], options['categories'], options['batch_size'])
+        try:
+            self.report(categories, options['iterations'], options['page_size'])
+        finally:
+            if not options['keep']:
+                self.cleanup(categories)
+
+    def seed(self, count, category_count, batch_size):
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            categories = Category.objects.bulk_create(
+                Category(title=f'{BENCH_PREFIX}{index}', icon='', description='')
+                for index in range(category_count)
+            )
+
+            for start in range(0, count, batch_size):
+                Product.objects.bulk_create(
+                    self.build_product(index, categories) for index in range(start, min(start + batch_size, count))
+                )
+
+        # bulk_create sends no signals, so invalidate the catalog cache by hand.
+        cache.bump_version(Category)
+        cache.bump_version(Product)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+        self.stdout.write(f'Seeded {count} products in {time.perf_counter() - started:.1f}s')
+        return categories
+
+    def build_product(self, index, categories):
+        return Product(
+            title=f'{BENCH_PREFIX}product {index}',
+            slug=f'{BENCH_PREFIX}{index}',
+            description='',
+            image='',
+            price=self.random.randint(1_000, 1_000_000),
+            unit=ProductUnitEnum.ONE,
+            quantity=self.random.choice([0, 0, self.random.randint(1, 100)]),
+            category=self.random.choice(categories),
+        )
+
+    def get_combinations(self, categories, page_size):
+        def category():
+            return self.random.choice(categories).id
+
+        def price_range():
+            low = self.random.randint(1_000, 900_000)
+            return {'price__gte': low, 'price__lte': low + 50_000}
+
+        products = Product.objects.all()
+
+        return {
+            'category': lambda: products.filter(category_id=category()).order_by('id')[:page_size],
+            'category count': lambda: products.filter(category_id=category()).count(),
+            'price range': lambda: products.filter(**price_range()).order_by('id')[:page_size],
+            'order by price': lambda: products.order_by('price')[:page_size],
+            'order by -price': lambda: products.order_by('-price')[:page_size],
+            'category + order by price': lambda: products.filter(category_id=category()).order_by('price')[:page_size],
+            'category + price range + order by price': lambda: (
+                products.filter(category_id=category(), **price_range()).order_by('price')[:page_size]
+            ),
+            'in stock + category + order by price': lambda: (
+                products.filter(category_id=category(), quantity__gt=0).order_by('price')[:page_size]
+            ),
+        }
+
+    def report(self, categories, iterations, page_size):
+        self.stdout.write(f'{"combination":<45}{"p50 ms":>10}{"p95 ms":>10}')
+
+        for name, build_query in self.get_combinations(categories, page_size).items():
+            timings = []
+
+            for _ in range(iterations):
+                started = time.perf_counter()
+                result = build_query()
+                if not isinstance(result, int):
+                    list(result)
+                timings.append((time.perf_counter() - started) * 1000)
+
+            p50 = statistics.median(timings)
+            p95 = statistics.quantiles(timings, n=20)[-1]
+            self.stdout.write(f'{name:<45}{p50:>10.2f}{p95:>10.2f}')
+
+    def cleanup(self, categories):
+        # Every seeded product belongs to a seeded category, so the seeded ids delimit the rows to remove.
+        category_ids = [category.id for category in categories]
+
+        with transaction.atomic():
+            Product.objects.filter(category_id__in=category_ids).delete()
+            Category.objects.filter(id__in=category_ids).delete()
@@ -0,0 +1,84 @@
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+
+from product.enums import ProductUnitEnum
+from product.fast_serializers import ProductValuesSerializer
+from product.models import Category, Product
+from product.serializers import ProductSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare µs per object of ProductSerializer and ProductValuesSerializer on the same rows. '
+        'Rows are seeded in a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1_000, help='Rows serialized per run.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per serializer; the best one is reported.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.seed(options['count'])
+                self.report(options['count'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    @staticmethod
+    def seed(count):
+        category = Category.objects.create(title='bench-serializers', icon='', description='')
+        Product.objects.bulk_create(
+            Product(
+                title=f'bench-serializers {index}',
+                slug=f'bench-serializers-{index}',
+                description='',
+                image=f'product/bench-{index}.png',
+                price=index * 100,
+                unit=ProductUnitEnum.ONE,
+                quantity=index % 10,
+                category=category,
+            )
+            for index in range(count)
+        )
+
+    # The serializers build absolute image URLs from the request, which validates its host against ALLOWED_HOSTS.
+    @override_settings(ALLOWED_HOSTS=['testserver'])
+    def report(self, count, repeat):
+        request = Request(RequestFactory().get('/api/shop/products/'))
+        request.user = AnonymousUser()
+        context = {'request': request, 'user': request.user}
+
+        queryset = Product.objects.with_is_user_favorite(request.user).filter(title__startswith='bench-serializers')
+        instances = list(queryset)
+        rows = list(ProductValuesSerializer.values(queryset))
+
+        runs = {
+            'ProductSerializer': lambda: ProductSerializer(instances, many=True, context=context).data,
+            'ProductValuesSerializer': lambda: ProductValuesSerializer(rows, many=True, context=context).data,
+        }
+
+        results = {}
+        for name, run in runs.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                run()
+                timings.append(time.perf_counter() - started)
+            results[name] = min(timings) / count * 1_000_000
+
+        for name, micros in results.items():
+            self.stdout.write(f'{name:<24} {micros:8.1f} µs/object')
+
+        baseline, fast = results.values()
+        self.stdout.write(f'speedup: {baseline / fast:.1f}x')
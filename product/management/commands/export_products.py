@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product import export
+from product.filters import FullTextSearchFilter, ProductFilterSet
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Stream the catalog as CSV or JSONL, with the same filters as the product list endpoint.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='-', help="Target file, or '-' for stdout.")
+        parser.add_argument('--format', choices=export.FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=2_000)
+        parser.add_argument('--category-id', type=int)
+        parser.add_argument('--min-price', type=int)
+        parser.add_argument('--max-price', type=int)
+        parser.add_argument('--in-stock', action='store_true')
+        parser.add_argument('--search')
+        parser.add_argument('--fuzzy', action='store_true')
+        parser.add_argument('--ordering', choices=['price', '-price'])
+
+    def handle(self, *args, **options):
+        params = {
+            name: options[name] for name in ('category_id', 'min_price', 'max_price', 'in_stock')
+            if options[name] not in (None, False)
+        }
+        filterset = ProductFilterSet(params, queryset=Product.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+
+        queryset = filterset.qs
+        if options['ordering']:
+            queryset = queryset.order_by(options['ordering'])
+        if options['search']:
+            queryset = FullTextSearchFilter().search(queryset, options['search'].split(), options['fuzzy'])
+
+        chunks = export.export_products(queryset, options['format'], options['chunk_size'], options['gzip'])
+
+        started = time.perf_counter()
+        size = 0
+
+        with self.open_output(options['output']) as output:
+            for chunk in chunks:
+                output.write(chunk)
+                size += len(chunk)
+
+        self.stderr.write(f'Exported {size / 1024 / 1024:.1f} MiB in {time.perf_counter() - started:.1f}s')
+
+    @staticmethod
+    def open_output(path):
+        if path == '-':
+            return open(sys.stdout.fileno(), 'wb', closefd=False)
+        try:
+            return open(path, 'wb')
+        except OSError as error:
+            raise CommandError(error)
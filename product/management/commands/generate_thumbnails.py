@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from product import thumbnails
+from product.models import Category, Product
+
+IMAGE_FIELDS = {'product': (Product, 'image'), 'category': (Category, 'icon')}
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp'}
+
+
+def generate(model, pk, field_name):
+    try:
+        return thumbnails.generate_thumbnails(model, pk, field_name)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Backfill WebP thumbnails for product images and category icons that are missing or stale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=IMAGE_FIELDS, action='append', help='Defaults to both.')
+        parser.add_argument('--force', action='store_true', help='Regenerate thumbnails that are up to date.')
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument(
+            '--directory', action='append', default=[],
+            help='Also render loose image files of a directory (e.g. assets/products) into its thumbnails/ folder.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        for name in options['model'] or IMAGE_FIELDS:
+            model, field_name = IMAGE_FIELDS[name]
+            pks = self.get_pending(model, field_name, options['force'])
+
+            if options['workers'] <= 1:
+                done = sum(thumbnails.generate_thumbnails(model, pk, field_name) for pk in pks)
+            else:
+                with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                    done = sum(executor.map(lambda pk: generate(model, pk, field_name), pks))
+
+            self.stdout.write(f'{name}: {done} of {len(pks)} rows updated')
+
+        for directory in options['directory']:
+            self.stdout.write(f'{directory}: {self.render_directory(Path(directory))} files rendered')
+
+        self.stdout.write(f'Done in {time.perf_counter() - started:.1f}s')
+
+    @staticmethod
+    def get_pending(model, field_name, force):
+        rows = model.objects.exclude(**{field_name: ''}).values_list('pk', field_name, 'thumbnails')
+        return [pk for pk, name, rendered in rows.iterator() if force or (rendered or {}).get('source') != name]
+
+    @staticmethod
+    def render_directory(directory):
+        if not directory.is_dir():
+            raise CommandError(f'{directory} is not a directory.')
+
+        storage = FileSystemStorage(location=directory)
+        widths = thumbnails.get_widths()
+        files = [path.name for path in sorted(directory.iterdir()) if path.suffix.lower() in IMAGE_SUFFIXES]
+
+        for name in files:
+            thumbnails.render_thumbnails(storage, name, widths)
+
+        return len(files)
@@ -0,0 +1,215 @@
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.text import slugify
+
+from product import cache
+from product.enums import ProductUnitEnum
+from product.models import Category, Product
+from product.stock import MAX_QUANTITY, MAX_PRICE
+
+UPDATE_FIELDS = ['description', 'image', 'price', 'unit', 'quantity', 'category', 'updated_at']
+TITLE_MAX_LENGTH = Product._meta.get_field('title').max_length
+SLUG_MAX_LENGTH = Product._meta.get_field('slug').max_length
+CATEGORY_MAX_LENGTH = Category._meta.get_field('title').max_length
+
+
+def read_records(stream, input_format):
+    """Yield `(line_number, dict)` pairs one at a time, so memory stays flat for any file size."""
+    if input_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except json.JSONDecodeError as error:
+            yield line_number, {'__error__': f'invalid JSON: {error}'}
+
+
+def clean_record(record):
+    if error := record.get('__error__'):
+        raise ValueError(error)
+
+    title = (record.get('title') or '').strip()
+    if not title:
+        raise ValueError('title is required')
+    if len(title) > TITLE_MAX_LENGTH:
+        raise ValueError(f'title longer than {TITLE_MAX_LENGTH} characters')
+
+    slug = (record.get('slug') or '').strip() or slugify(title)
+    if len(slug) > SLUG_MAX_LENGTH:
+        raise ValueError(f'slug longer than {SLUG_MAX_LENGTH} characters')
+
+    category = (record.get('category') or '').strip()
+    if not category:
+        raise ValueError('category is required')
+    if len(category) > CATEGORY_MAX_LENGTH:
+        raise ValueError(f'category longer than {CATEGORY_MAX_LENGTH} characters')
+
+    unit = str(record.get('unit') or ProductUnitEnum.ONE)
+    if unit not in ProductUnitEnum.values:
+        raise ValueError(f'invalid unit {unit!r}')
+
+    price = record.get('price')
+    price = int(price) if price not in (None, '') else None
+    if price is not None and not 0 <= price <= MAX_PRICE:
+        raise ValueError(f'invalid price {price}')
+
+    quantity = int(record.get('quantity') or 0)
+    if not 0 <= quantity <= MAX_QUANTITY:
+        raise ValueError(f'invalid quantity {quantity}')
+
+    return {
+        'title': title,
+        'slug': slug,
+        'description': record.get('description') or '',
+        'image': record.get('image') or '',
+        'price': price,
+        'unit': unit,
+        'quantity': quantity,
+        'category': category,
+    }
+
+
+def clean_chunk(chunk):
+    """Validate a chunk of records; runs in worker processes when `--workers` is set."""
+    rows, errors = [], []
+
+    for line_number, record in chunk:
+        try:
+            rows.append((line_number, clean_record(record)))
+        except (AttributeError, TypeError, ValueError) as error:
+            errors.append((line_number, str(error)))
+
+    return rows, errors
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def map_chunks(chunks, workers):
+    if workers <= 1:
+        yield from map(clean_chunk, chunks)
+        return
+
+    # A bounded window of in-flight chunks keeps memory flat, unlike Executor.map which drains its input.
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(executor.submit(clean_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+class Command(BaseCommand):
+    help = 'Stream products from a CSV or JSONL file and upsert them on (title, slug) in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV/JSONL file, or '-' for stdin.")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1_000)
+        parser.add_argument('--workers', type=int, default=1, help='Processes used for parsing and validation.')
+        parser.add_argument('--create-categories', action='store_true', help='Create categories missing by title.')
+
+    def handle(self, *args, **options):
+        input_format = options['format'] or self.guess_format(options['path'])
+        batch_size = options['batch_size']
+        self.create_categories = options['create_categories']
+        self.categories = dict(Category.objects.values_list('title', 'id'))
+
+        started = time.perf_counter()
+        imported = skipped = 0
+
+        with self.open_input(options['path']) as stream:
+            chunks = chunked(read_records(stream, input_format), batch_size)
+
+            for rows, errors in map_chunks(chunks, options['workers']):
+                products = self.build_products(rows, errors)
+                imported += self.upsert(products, batch_size)
+                skipped += len(errors)
+
+                for line_number, error in errors[:10]:
+                    self.stderr.write(f'line {line_number}: {error}')
+
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'{imported} rows, {imported / (time.perf_counter() - started):.0f} rows/s')
+
+        if imported:
+            # bulk_create sends no signals, so invalidate the catalog cache by hand.
+            cache.bump_version(Product)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Imported {imported} rows ({skipped} skipped) in {elapsed:.1f}s ({imported / elapsed:.0f} rows/s)'
+        )
+
+    @staticmethod
+    def guess_format(path):
+        suffix = Path(path).suffix.lower()
+        if suffix in ('.jsonl', '.ndjson'):
+            return 'jsonl'
+        if suffix == '.csv':
+            return 'csv'
+        raise CommandError('Cannot guess the input format, pass --format.')
+
+    @staticmethod
+    def open_input(path):
+        if path == '-':
+            return open(sys.stdin.fileno(), encoding='utf-8', newline='', closefd=False)
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+
+    def get_category_id(self, title):
+        if title not in self.categories and self.create_categories:
+            category = Category.objects.create(title=title, icon='', description='')
+            self.categories[title] = category.id
+
+        return self.categories.get(title)
+
+    def build_products(self, rows, errors):
+        # Postgres rejects an upsert that touches the same row twice, so the last duplicate wins.
+        products = {}
+
+        for line_number, row in rows:
+            category = row.pop('category')
+            if (category_id := self.get_category_id(category)) is None:
+                errors.append((line_number, f'unknown category {category!r}'))
+                continue
+
+            products[row['title'], row['slug']] = Product(category_id=category_id, **row)
+
+        return list(products.values())
+
+    @staticmethod
+    def upsert(products, batch_size):
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['title', 'slug'],
+                update_fields=UPDATE_FIELDS,
+            )
+
+        return len(products)
@@ -0,0 +1,103 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(samples, fraction):
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)]
+
+
+class Worker(threading.Thread):
+    """Replays `urls` round-robin over one keep-alive connection until `deadline`."""
+
+    def __init__(self, urls, headers, deadline):
+        super().__init__(daemon=True)
+        self.urls = urls
+        self.headers = headers
+        self.deadline = deadline
+        self.latencies = []
+        self.errors = 0
+
+    def run(self):
+        connection = None
+        index = 0
+
+        while time.perf_counter() < self.deadline:
+            url = self.urls[index % len(self.urls)]
+            index += 1
+
+            if connection is None:
+                connection_class = http.client.HTTPSConnection if url.scheme == 'https' else http.client.HTTPConnection
+                connection = connection_class(url.netloc, timeout=30)
+
+            started = time.perf_counter()
+            try:
+                connection.request('GET', url.path + (f'?{url.query}' if url.query else ''), headers=self.headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                self.errors += 1
+                connection.close()
+                connection = None
+                continue
+
+            if response.status >= 400:
+                self.errors += 1
+            else:
+                self.latencies.append(time.perf_counter() - started)
+
+        if connection is not None:
+            connection.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive GET load against a running server and report throughput and latency percentiles. '
+        'Run it once against the WSGI server and once against the ASGI server to compare '
+        '/api/shop/... with /api/async/shop/....'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', required=True, help='Absolute URL; repeat to mix endpoints.')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds.')
+        parser.add_argument('--token', help='JWT access token sent as a Bearer header.')
+
+    def handle(self, *args, **options):
+        urls = [urlsplit(url) for url in options['url']]
+        if any(url.scheme not in ('http', 'https') for url in urls):
+            raise CommandError('URLs must be absolute http(s) URLs.')
+
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Bearer {options["token"]}'
+
+        deadline = time.perf_counter() + options['duration']
+        workers = [Worker(urls, headers, deadline) for _ in range(options['concurrency'])]
+
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for worker in workers for latency in worker.latencies)
+        errors = sum(worker.errors for worker in workers)
+        if not latencies:
+            raise CommandError(f'No successful requests ({errors} errors).')
+
+        self.stdout.write(
+            f'{len(latencies)} requests, {errors} errors in {elapsed:.1f}s '
+            f'({len(latencies) / elapsed:.0f} req/s, concurrency {options["concurrency"]})'
+        )
+        self.stdout.write(
+            f'latency ms: mean {statistics.mean(latencies) * 1000:.1f}, '
+            f'p50 {percentile(latencies, 0.50) * 1000:.1f}, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.1f}, '
+            f'p99 {percentile(latencies, 0.99) * 1000:.1f}'
+        )
@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from product import cache
+from product.models import Comment, Product
+
+
+class Command(BaseCommand):
+    help = 'Rebuild Product.rate, rate_sum and rate_count from comments with one grouped aggregate.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2_000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        ratings = {
+            row['product_id']: (row['rate_sum'], row['rate_count'])
+            for row in Comment.objects.values('product_id').annotate(rate_sum=Sum('rate'), rate_count=Count('id'))
+        }
+
+        now = timezone.now()
+        scanned = updated = 0
+        batch = []
+
+        products = Product.objects.only('id', 'rate', 'rate_sum', 'rate_count').order_by('id')
+        for product in products.iterator(chunk_size=batch_size):
+            scanned += 1
+            rate_sum, rate_count = ratings.get(product.id, (0, 0))
+            # Half-up, like Round() in product.ratings.average_rate.
+            rate = (2 * rate_sum + rate_count) // (2 * rate_count) if rate_count else 0
+
+            if (product.rate, product.rate_sum, product.rate_count) == (rate, rate_sum, rate_count):
+                continue
+
+            product.rate, product.rate_sum, product.rate_count, product.updated_at = rate, rate_sum, rate_count, now
+            batch.append(product)
+
+            if len(batch) >= batch_size:
+                updated += self.flush(batch)
+
+        updated += self.flush(batch)
+
+        if updated:
+            cache.bump_version(Product)
+
+        self.stdout.write(
+            f'Scanned {scanned} products, updated {updated} in {time.perf_counter() - started:.1f}s'
+        )
+
+    @staticmethod
+    def flush(batch):
+        with transaction.atomic():
+            Product.objects.bulk_update(batch, ['rate', 'rate_sum', 'rate_count', 'updated_at'])
+
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from product.stock import release_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete open carts idle past the TTL and return their reserved stock, one short transaction per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ttl', type=int, default=settings.ABANDONED_CART_TTL, help='Cart idle time in seconds.')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        updated_before = timezone.now() - timedelta(seconds=options['ttl'])
+        started = time.perf_counter()
+        carts = items = units = batches = 0
+
+        while True:
+            with transaction.atomic():
+                batch = release_abandoned_carts(updated_before, options['batch_size'])
+
+            if not batch[0]:
+                break
+
+            carts, items, units, batches = carts + batch[0], items + batch[1], units + batch[2], batches + 1
+
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Released {carts} carts ({items} items, {units} units) in {batches} batches '
+            f'in {elapsed:.1f}s ({carts / elapsed if elapsed else 0:.0f} carts/s)'
+        )
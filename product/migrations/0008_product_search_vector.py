@@ -0,0 +1,57 @@
+# Generated by Django 4.2 on 2026-10-18 16:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+SEARCH_VECTOR = '''
+    setweight(to_tsvector('english', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('english', replace(coalesce({row}slug, ''), '-', ' ')), 'B') ||
+    setweight(to_tsvector('english', coalesce({row}description, '')), 'C')
+'''
+
+CREATE_TRIGGER = f'''
+CREATE FUNCTION product_product_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector := {SEARCH_VECTOR.format(row='NEW.')};
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER product_product_search_vector
+BEFORE INSERT OR UPDATE OF title, slug, description ON product_product
+FOR EACH ROW EXECUTE FUNCTION product_product_search_vector_update();
+
+UPDATE product_product SET search_vector = {SEARCH_VECTOR.format(row='')};
+'''
+
+DROP_TRIGGER = '''
+DROP TRIGGER product_product_search_vector ON product_product;
+DROP FUNCTION product_product_search_vector_update();
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0007_category_updated_at_product_updated_at'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='product_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunSQL(CREATE_TRIGGER, DROP_TRIGGER),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0009_product_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rate_sum',
+            field=models.IntegerField(default=0),
+        ),
+    ]
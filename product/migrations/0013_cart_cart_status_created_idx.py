@@ -0,0 +1,19 @@
+# Generated by Django 4.2 on 2026-10-18 17:10
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('product', '0012_category_thumbnails_product_thumbnails'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cart',
+            index=models.Index(fields=['status', 'created_at'], name='cart_status_created_idx'),
+        ),
+    ]
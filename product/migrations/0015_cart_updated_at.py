@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0014_order_orderline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        # Existing carts were last known to change when they were created.
+        migrations.RunSQL(
+            'UPDATE product_cart SET updated_at = created_at',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-18 18:21
+
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('product', '0015_cart_updated_at'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='cart',
+            index=models.Index(fields=['status', 'updated_at'], name='cart_status_updated_idx'),
+        ),
+        RemoveIndexConcurrently(
+            model_name='cart',
+            name='cart_status_created_idx',
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 19:10
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('product', '0016_cart_status_updated_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.functions.comparison.Cast('title', models.TextField())), name='gin_trgm_ops'), name='product_title_upper_trgm_idx'),
+        ),
+    ]
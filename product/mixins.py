@@ -0,0 +1,77 @@
+import hashlib
+from typing import Callable
+
+from django.contrib.admin.utils import get_fields_from_path
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Q, QuerySet
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from product.cache import normalize_query
+
+
+class ConditionalGetMixin:
+    """
+    Answers If-None-Match / If-Modified-Since with 304 from a max-updated-at plus count fingerprint,
+    before anything is serialized.
+    """
+    last_modified_field = 'updated_at'
+
+    def get_conditional_queryset(self) -> QuerySet:
+        raise NotImplementedError
+
+    def get_fingerprint(self) -> dict:
+        return self.get_conditional_queryset().order_by().aggregate(
+            last_modified=Max(self.last_modified_field),
+            count=Count('pk'),
+            last_id=Max('pk'),
+        )
+
+    def conditional_response(self, request: Request, get_response: Callable[[], Response]) -> Response:
+        fingerprint = self.get_fingerprint()
+        last_modified = fingerprint['last_modified']
+
+        state = repr((sorted(fingerprint.items()), normalize_query(request)))
+        etag = f'"{hashlib.md5(state.encode()).hexdigest()}"'
+        timestamp = last_modified.timestamp() if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = get_response()
+
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+
+        return response
+
+
+class ExactSearchMixin:
+    """
+    ModelAdmin search that matches `search_fields` with plain `exact` lookups, which their btree indexes
+    serve. Django's `=` prefix compares `UPPER(column::text)` instead, a full scan on large tables. Terms
+    that don't convert to a field's type (e.g. a username against an id) skip that field.
+    """
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        lookups = []
+        for path in self.search_fields:
+            try:
+                value = get_fields_from_path(self.model, path)[-1].to_python(search_term)
+            except ValidationError:
+                continue
+            lookups.append(Q(**{path: value}))
+
+        if len(lookups) < 2:
+            return queryset.filter(*lookups) if lookups else queryset.none(), False
+
+        # An OR across joined tables can't use the per-field indexes; a union of per-field matches can.
+        matches = [self.model._default_manager.filter(lookup).values('pk') for lookup in lookups]
+        return queryset.filter(pk__in=matches[0].union(*matches[1:])), False
@@ -1,35 +1,83 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, Exists, OuterRef, Value, ExpressionWrapper
+from django.db.models.functions import Cast, Upper
 
 from product.enums import ProductUnitEnum, CartStatusEnum
 
+FAVORITE_IDS_INLINE_LIMIT = 500
+
 
 class Category(models.Model):
     title = models.CharField(max_length=128)
     icon = models.ImageField(upload_to='category/')
+    # WebP renditions of `icon` by width, written by product.thumbnails.
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.title
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_is_user_favorite(self, user):
+        if user.is_anonymous:
+            return self.annotate(is_user_favorite=Value(False))
+
+        # Users resolved by CachedJWTAuthentication carry their favorite IDs; a short IN list beats EXISTS.
+        favorite_ids = getattr(user, 'favorite_product_ids', None)
+        if favorite_ids is not None and len(favorite_ids) <= FAVORITE_IDS_INLINE_LIMIT:
+            if not favorite_ids:
+                return self.annotate(is_user_favorite=Value(False))
+            return self.annotate(
+                is_user_favorite=ExpressionWrapper(Q(pk__in=sorted(favorite_ids)), output_field=models.BooleanField())
+            )
+
+        favorites = user.favorite_products.through.objects.filter(user_id=user.id, product_id=OuterRef('pk'))
+        return self.annotate(is_user_favorite=Exists(favorites))
+
+
 class Product(models.Model):
     title = models.CharField(max_length=128, verbose_name='Product title', blank=True)
     slug = models.SlugField(max_length=128)
     description = models.TextField()
     image = models.ImageField(upload_to='product/')
+    # WebP renditions of `image` by width, written by product.thumbnails.
+    thumbnails = models.JSONField(default=dict, blank=True, editable=False)
     price = models.PositiveBigIntegerField(null=True)
     unit = models.CharField(max_length=128, choices=ProductUnitEnum.choices)
     quantity = models.IntegerField(default=0)
+    # Rounded average of comment rates; rate_sum and rate_count are kept in step by product.ratings.
     rate = models.IntegerField(default=0)
+    rate_sum = models.IntegerField(default=0)
     rate_count = models.IntegerField(default=0)
-    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    # Served by the leading column of product_category_price_idx.
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, db_index=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Maintained by the product_product_search_vector trigger, see migration 0008.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'My Product'
         verbose_name_plural = 'All of my product'
         unique_together = ('title', 'slug')
+        indexes = [
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+            models.Index(fields=['category', 'price'], condition=Q(quantity__gt=0), name='product_in_stock_idx'),
+            GinIndex(fields=['search_vector'], name='product_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='product_title_trgm_idx'),
+            # The admin's icontains search compares UPPER(title::text), which the index above can't serve.
+            GinIndex(
+                OpClass(Upper(Cast('title', models.TextField())), name='gin_trgm_ops'),
+                name='product_title_upper_trgm_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -38,9 +86,12 @@ class Product(models.Model):
 class Cart(models.Model):
     user = models.ForeignKey(to='account.User', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Touched by every cart write; open carts idle past ABANDONED_CART_TTL are released by product.stock.
+    updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=128, choices=CartStatusEnum.choices)
 
     class Meta:
+        indexes = [models.Index(fields=['status', 'updated_at'], name='cart_status_updated_idx')]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'status'],
@@ -59,15 +110,40 @@ class CartItem(models.Model):
         constraints = [models.UniqueConstraint(fields=['product', 'cart'], name='cart_item_unique')]
 
 
+class Order(models.Model):
+    user = models.ForeignKey(to='account.User', on_delete=models.CASCADE, db_index=False)
+    cart = models.OneToOneField(to=Cart, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Snapshots of the lines at checkout, written by product.orders.checkout.
+    item_count = models.IntegerField(default=0)
+    total_price = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-created_at', '-id'], name='order_user_created_idx')]
+
+
+class OrderLine(models.Model):
+    order = models.ForeignKey(to=Order, on_delete=models.CASCADE, related_name='lines')
+    product = models.ForeignKey(to=Product, on_delete=models.SET_NULL, null=True)
+    title = models.CharField(max_length=128)
+    unit_price = models.PositiveBigIntegerField()
+    quantity = models.IntegerField()
+    total_price = models.PositiveBigIntegerField()
+
+
 class Comment(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='comments', verbose_name='Product')
     user = models.ForeignKey('account.User', on_delete=models.CASCADE, related_name='comments', verbose_name='User')
     rate = models.SmallIntegerField(validators=[MinValueValidator(0), MaxValueValidator(5)], verbose_name='Rate')
     content = models.TextField(verbose_name='Content')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Created at')
 
     class Meta:
         unique_together = ('product', 'user')
         verbose_name = 'Comment'
+        indexes = [
+            models.Index(fields=['product', '-created_at', '-id'], name='comment_product_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.product} - {self.user}'
@@ -0,0 +1,51 @@
+from django.db import connection
+
+from product.enums import CartStatusEnum
+from product.models import Product, Cart, CartItem, Order, OrderLine
+
+
+def checkout(user) -> Order | None:
+    """
+    Close the open cart of `user` into an order. Must run inside a transaction.
+
+    The lines are copied from the cart items with the current titles and prices, and the order totals
+    are summed from them, in one `INSERT ... SELECT`. Returns None when there is nothing to check out,
+    in which case the caller must roll the transaction back.
+
+    Cart writers lock the open cart too (see `product.stock.lock_open_cart`), so no line can change
+    between the snapshot and the cart being closed.
+    """
+    cart = Cart.objects.select_for_update().filter(user=user, status=CartStatusEnum.OPEN).first()
+    if cart is None:
+        return None
+
+    order = Order.objects.create(user=user, cart=cart)
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH lines AS ('
+            f'INSERT INTO {quote(OrderLine._meta.db_table)} '
+            f'(order_id, product_id, title, unit_price, quantity, total_price) '
+            f'SELECT %s, product.id, product.title, COALESCE(product.price, 0), item.quantity, '
+            f'item.quantity * COALESCE(product.price, 0) '
+            f'FROM {quote(CartItem._meta.db_table)} AS item '
+            f'JOIN {quote(Product._meta.db_table)} AS product ON product.id = item.product_id '
+            f'WHERE item.cart_id = %s AND item.quantity > 0 ORDER BY item.id '
+            f'RETURNING quantity, total_price) '
+            f'UPDATE {quote(Order._meta.db_table)} '
+            f'SET item_count = totals.item_count, total_price = totals.total_price '
+            f'FROM (SELECT COUNT(*) AS line_count, COALESCE(SUM(quantity), 0) AS item_count, '
+            f'COALESCE(SUM(total_price), 0) AS total_price FROM lines) AS totals '
+            f'WHERE id = %s AND totals.line_count > 0 RETURNING totals.item_count, totals.total_price',
+            [order.id, cart.id, order.id],
+        )
+        totals = cursor.fetchone()
+
+    if totals is None:
+        return None
+
+    order.item_count, order.total_price = totals
+    Cart.objects.filter(id=cart.id).update(status=CartStatusEnum.CLOSED)
+
+    return order
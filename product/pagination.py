@@ -0,0 +1,193 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import cached_property, partial
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination over the view's `ordering` field plus an `id` tie-breaker.
+
+    Pages are fetched with `WHERE field >= last_field AND (field > last_field OR (field = last_field AND
+    id > last_id)) LIMIT size + 1`, so there is no `COUNT(*)` and no `OFFSET`; the redundant top-level
+    range gives the `(field, id)` btree index a start key. NULLs keep Postgres' default placement (last
+    ascending, first descending) and are read by a separate query once the other segment is used up.
+    """
+    page_size = 20
+    page_size_query_param = 'size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    tie_breaker = 'id'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.field, self.descending = self.get_ordering(request, queryset, view)
+
+        queryset = queryset.order_by(*self.get_order_by())
+        cursor = self.decode_cursor(request, queryset.model)
+        segments = [None] if cursor is None else self.get_cursor_filters(*cursor)
+
+        page_size = self.get_page_size(request)
+        results = []
+        for segment in segments:
+            rows = queryset if segment is None else queryset.filter(segment)
+            results += rows[:page_size + 1 - len(results)]
+            if len(results) > page_size:
+                break
+
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size < 1:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None)
+
+        for backend in getattr(view, 'filter_backends', []):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+
+        if not ordering:
+            return None, False
+
+        field = ordering if isinstance(ordering, str) else ordering[0]
+        return field.lstrip('-'), field.startswith('-')
+
+    def get_order_by(self):
+        prefix = '-' if self.descending else ''
+
+        if self.field is None:
+            return [f'{prefix}{self.tie_breaker}']
+
+        return [f'{prefix}{self.field}', f'{prefix}{self.tie_breaker}']
+
+    def get_cursor_filters(self, value, pk):
+        """
+        Filters for the rows after the cursor, one per segment in page order: the rows sharing the
+        cursor's NULL-ness first, then the other segment when the ordering reaches it next.
+        """
+        lookup = 'lt' if self.descending else 'gt'
+        after_pk = Q(**{f'{self.tie_breaker}__{lookup}': pk})
+
+        if self.field is None:
+            return [after_pk]
+
+        if value is None:
+            is_null = Q(**{f'{self.field}__isnull': True}) & after_pk
+            # NULLs come first when descending, so every non-NULL row is still ahead.
+            return [is_null, Q(**{f'{self.field}__isnull': False})] if self.descending else [is_null]
+
+        from_value = Q(**{f'{self.field}__{lookup}e': value})
+        after_value = from_value & (Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value}) & after_pk)
+        return [after_value] if self.descending else [after_value, Q(**{f'{self.field}__isnull': True})]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            value, pk = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(value, (int, float, str, type(None))):
+            raise NotFound(self.invalid_cursor_message)
+
+        # The cursor is client input: convert it the way the ordering field would, so a value of the
+        # wrong type is an invalid cursor rather than a database error.
+        if self.field is not None:
+            try:
+                value = model._meta.get_field(self.field).to_python(value)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        return value, pk
+
+    def encode_cursor(self, instance):
+        # Pages are model instances or, for values-serialized views, .values() dicts.
+        get = instance.get if isinstance(instance, dict) else partial(getattr, instance)
+        value = get(self.field) if self.field else None
+        # isoformat() keeps the microseconds that DjangoJSONEncoder would drop.
+        position = json.dumps([value, get(self.tie_breaker)], default=lambda obj: obj.isoformat())
+        return urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin changelist paginator that reads the row count of an unfiltered changelist from Postgres'
+    planner statistics (`pg_class.reltuples`) instead of running `COUNT(*)` over a large table.
+    Filtered changelists and tables below `estimate_threshold` rows are still counted exactly.
+    """
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is not None and not queryset.query.where:
+            estimate = self.get_estimate(queryset)
+            if estimate >= self.estimate_threshold:
+                return estimate
+
+        return super().count
+
+    @staticmethod
+    def get_estimate(queryset) -> int:
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+
+        # reltuples is -1 until the table has been vacuumed or analyzed.
+        return row[0] if row else -1
@@ -0,0 +1,40 @@
+from django.db.models import F, FloatField, IntegerField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+from django.utils import timezone
+
+from product import cache
+from product.models import Product
+
+
+def average_rate(rate_sum, rate_count):
+    return Coalesce(
+        Round(Cast(rate_sum, FloatField()) / NullIf(rate_count, Value(0))),
+        Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def apply_rating(product_id: int, rate: int, count: int) -> None:
+    """
+    Add (`count=1`) or remove (`count=-1`) one comment rate from the product's denormalized
+    aggregates with a single UPDATE, so concurrent comments never lose an increment.
+    """
+    rate_sum = F('rate_sum') + rate * count
+    rate_count = F('rate_count') + count
+
+    Product.objects.filter(id=product_id).update(
+        rate_sum=rate_sum,
+        rate_count=rate_count,
+        rate=average_rate(rate_sum, rate_count),
+        updated_at=timezone.now(),
+    )
+    # update() bypasses the post_save signal.
+    cache.bump_version(Product)
+
+
+def add_rating(product_id: int, rate: int) -> None:
+    apply_rating(product_id, rate, 1)
+
+
+def remove_rating(product_id: int, rate: int) -> None:
+    apply_rating(product_id, rate, -1)
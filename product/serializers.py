@@ -2,10 +2,32 @@ from rest_framework import serializers
 from rest_framework.exceptions import NotFound, ValidationError
 
 from account.models import User
-from product.models import Category, Product, CartItem, Comment
+from product.models import Category, Product, CartItem, Comment, Order, OrderLine
+from product.stock import MAX_QUANTITY, MAX_PRICE
+from product.thumbnails import thumbnail_urls
+
+
+class ThumbnailsField(serializers.ReadOnlyField):
+    """Render the `thumbnails` JSON of a model as `{width: url}`, absolute when a request is in the context."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        super().__init__(source='*', **kwargs)
+
+    def to_representation(self, instance):
+        storage = instance._meta.get_field(self.image_field).storage
+        request = self.context.get('request')
+
+        def get_url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+
+        return thumbnail_urls(instance.thumbnails, getattr(instance, self.image_field).name, get_url)
 
 
 class CategorySerializer(serializers.ModelSerializer):
+    thumbnails = ThumbnailsField('icon')
+
     class Meta:
         model = Category
         exclude = ('description',)
@@ -13,9 +35,12 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class ProductSerializer(serializers.ModelSerializer):
     is_user_favorite = serializers.SerializerMethodField()
+    thumbnails = ThumbnailsField('image')
 
     def get_is_user_favorite(self, obj: Product):
-        # TODO: Bad way. Fix me later.
+        if hasattr(obj, 'is_user_favorite'):
+            return obj.is_user_favorite
+
         user: User = self.context['user']
 
         if user.is_anonymous:
@@ -25,12 +50,28 @@ class ProductSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Product
-        exclude = ('description',)
+        exclude = ('description', 'search_vector', 'rate_sum')
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'title', 'price', 'image']
+
+
+class CartLineSerializer(serializers.ModelSerializer):
+    product = CartProductSerializer()
+    total_price = serializers.IntegerField()
+
+    class Meta:
+        model = CartItem
+        fields = ['id', 'product', 'quantity', 'total_price']
 
 
 class CartSerializer(serializers.Serializer):
     item_counts = serializers.IntegerField(default=0)
     total_price = serializers.FloatField(default=0.0)
+    items = CartLineSerializer(many=True, default=list)
 
 
 class CartItemDetailSerializer(serializers.ModelSerializer):
@@ -49,12 +90,13 @@ class CartItemRequestBodySerializer(serializers.Serializer):
         product_id = attrs['product_id']
 
         try:
-            product = Product.objects.get(id=product_id)
+            product = Product.objects.only('id').get(id=product_id)
         except Product.DoesNotExist:
             raise NotFound(f'Product with id {product_id} not found!')
 
+        # Stock is checked by the conditional reservation update, not against a stale read.
         quantity = attrs['quantity']
-        if quantity > product.quantity or quantity < 1:
+        if quantity < 1:
             raise ValidationError(f'Invalid quantity {quantity}')
 
         attrs['product'] = product
@@ -62,18 +104,111 @@ class CartItemRequestBodySerializer(serializers.Serializer):
         return attrs
 
 
+class CartBulkItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class CartBulkRequestBodySerializer(serializers.Serializer):
+    items = CartBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_items(self, items):
+        product_ids = [item['product_id'] for item in items]
+
+        if len(set(product_ids)) != len(product_ids):
+            raise ValidationError('Duplicate product ids.')
+
+        found = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True))
+        if missing := [product_id for product_id in product_ids if product_id not in found]:
+            raise NotFound(f'Products with ids {missing} not found!')
+
+        return items
+
+
+class InventoryChangeSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=0, max_value=MAX_QUANTITY, required=False)
+    quantity_delta = serializers.IntegerField(min_value=-MAX_QUANTITY, max_value=MAX_QUANTITY, required=False)
+    price = serializers.IntegerField(min_value=0, max_value=MAX_PRICE, required=False)
+    price_delta = serializers.IntegerField(min_value=-MAX_PRICE, max_value=MAX_PRICE, required=False)
+
+    def validate(self, attrs):
+        if 'quantity' in attrs and 'quantity_delta' in attrs:
+            raise ValidationError('Send either quantity or quantity_delta.')
+
+        if 'price' in attrs and 'price_delta' in attrs:
+            raise ValidationError('Send either price or price_delta.')
+
+        if len(attrs) == 1:
+            raise ValidationError('Nothing to change.')
+
+        return attrs
+
+
+class InventoryRequestBodySerializer(serializers.Serializer):
+    # 3 bind parameters per row keeps the single UPDATE well below Postgres' 65535 limit.
+    changes = InventoryChangeSerializer(many=True, allow_empty=False, max_length=10_000)
+
+    def validate_changes(self, changes):
+        product_ids = [change['product_id'] for change in changes]
+
+        if len(set(product_ids)) != len(product_ids):
+            raise ValidationError('Duplicate product ids.')
+
+        return changes
+
+
+class FavoritesSyncRequestBodySerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list, max_length=1000)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1), default=list, max_length=1000)
+
+    def validate(self, attrs):
+        attrs['add'] = list(dict.fromkeys(attrs['add']))
+        attrs['remove'] = list(dict.fromkeys(attrs['remove']))
+
+        if not attrs['add'] and not attrs['remove']:
+            raise ValidationError('Nothing to sync.')
+
+        if set(attrs['add']) & set(attrs['remove']):
+            raise ValidationError('A product can not be both added and removed.')
+
+        return attrs
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ['id', 'product_id', 'cart_id', 'quantity']
 
 
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['id', 'product_id', 'title', 'unit_price', 'quantity', 'total_price']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    lines = OrderLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Order
+        fields = ['id', 'created_at', 'item_count', 'total_price', 'lines']
+
+
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ['rate', 'content']
 
 
+class CommentListSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username')
+
+    class Meta:
+        model = Comment
+        fields = ['id', 'username', 'rate', 'content', 'created_at']
+
+
 class UpdateProductsSerializer(serializers.Serializer):
     product_ids = serializers.ListField(
         child=serializers.IntegerField()
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from product import cache, thumbnails
+from product.models import Category, Product, Comment
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+def invalidate_catalog_cache(sender, **kwargs):
+    cache.bump_version(sender)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comments_cache(sender, instance: Comment, **kwargs):
+    cache.bump_version(cache.comments_scope(instance.product_id))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+def schedule_thumbnails(sender, instance: Category | Product, **kwargs):
+    field_name = 'icon' if sender is Category else 'image'
+    if thumbnails.needs_thumbnails(instance, field_name):
+        thumbnails.schedule_thumbnails(instance, field_name)
@@ -0,0 +1,167 @@
+from collections import Counter
+from datetime import datetime
+
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from product import cache
+from product.enums import CartStatusEnum
+from product.models import Product, Cart, CartItem
+
+# Column limits of Product.quantity (integer) and Product.price (bigint).
+MAX_QUANTITY = 2 ** 31 - 1
+MAX_PRICE = 2 ** 63 - 1
+
+
+def reserve_stocks(quantities: dict[int, int]) -> int | None:
+    """
+    Take `quantity` units of stock per product id (or release them when negative), one conditional
+    UPDATE per product in id order. Returns the first product id without enough stock left, in which
+    case the caller must roll the transaction back.
+    """
+    now = timezone.now()
+    changed = False
+
+    for product_id, quantity in sorted(quantities.items()):
+        if quantity == 0:
+            continue
+
+        products = Product.objects.filter(id=product_id)
+        if quantity > 0:
+            products = products.filter(quantity__gte=quantity)
+
+        if not products.update(quantity=F('quantity') - quantity, updated_at=now):
+            return product_id
+
+        changed = True
+
+    if changed:
+        # update() bypasses the post_save signal.
+        cache.bump_version(Product)
+
+    return None
+
+
+def reserve_stock(product_id: int, quantity: int) -> bool:
+    return reserve_stocks({product_id: quantity}) is None
+
+
+def adjust_inventory(changes: list[dict]) -> tuple[list[tuple[int, int, int | None]], dict[int, str]]:
+    """
+    Apply per-product `quantity`/`price` (absolute) or `quantity_delta`/`price_delta` (relative) changes
+    with one `UPDATE ... FROM (VALUES ...)`. Must run inside a transaction.
+
+    The rows are locked in id order first, like `reserve_stocks` does, so deltas are resolved against
+    the current values. Returns `(id, quantity, price)` rows, or per-id errors with nothing written.
+    """
+    changes = {change['product_id']: change for change in changes}
+    current = Product.objects.select_for_update().filter(id__in=changes).order_by('id').values_list(
+        'id', 'quantity', 'price',
+    )
+
+    rows, errors = [], {}
+    for product_id, quantity, price in current:
+        change = changes[product_id]
+
+        quantity = change.get('quantity', quantity + change.get('quantity_delta', 0))
+        if 'price_delta' in change and price is None:
+            errors[product_id] = 'Product has no price to adjust.'
+        else:
+            price = change.get('price', price if price is None else price + change.get('price_delta', 0))
+
+        if quantity < 0:
+            errors[product_id] = 'Quantity would become negative.'
+        elif quantity > MAX_QUANTITY:
+            errors[product_id] = 'Quantity would overflow.'
+        elif price is not None and price < 0:
+            errors[product_id] = 'Price would become negative.'
+        elif price is not None and price > MAX_PRICE:
+            errors[product_id] = 'Price would overflow.'
+
+        rows.append((product_id, quantity, price))
+
+    found = {row[0] for row in rows}
+    errors.update({product_id: 'Product not found.' for product_id in changes if product_id not in found})
+
+    if errors or not rows:
+        return [], errors
+
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::integer, %s::bigint)'] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} AS product SET quantity = changes.quantity, price = changes.price, updated_at = %s '
+            f'FROM (VALUES {values}) AS changes (id, quantity, price) WHERE product.id = changes.id',
+            [timezone.now(), *(value for row in rows for value in row)],
+        )
+
+    # The raw UPDATE bypasses the post_save signal.
+    cache.bump_version(Product)
+
+    return rows, {}
+
+
+def lock_open_cart(user) -> Cart:
+    """
+    Get or create the open cart of `user` with its row locked until the transaction ends. Every cart
+    writer goes through here, so writes serialize with checkout and `release_abandoned_carts`; a cart
+    closed or released while we waited for the lock is no longer open, and a new one is started.
+    """
+    if (cart := Cart.objects.select_for_update().filter(user=user, status=CartStatusEnum.OPEN).first()) is None:
+        cart, created = Cart.objects.get_or_create(user=user, status=CartStatusEnum.OPEN)
+        if not created:
+            # Lost the race to a concurrent request creating the same cart.
+            cart = Cart.objects.select_for_update().get(id=cart.id)
+
+    return cart
+
+
+def release_abandoned_carts(updated_before: datetime, limit: int) -> tuple[int, int, int]:
+    """
+    Delete up to `limit` open carts last changed before `updated_before` and put their reserved quantities
+    back into stock with one grouped UPDATE. Must run inside a transaction; keep `limit` small so row
+    locks are short-lived. Returns the number of carts, items and units released.
+
+    Carts are locked with SKIP LOCKED, so a cart held by a writer (see `lock_open_cart`) is left for the
+    next run. Their items are locked before the products, in id order like `reserve_stocks`.
+    """
+    cart_ids = list(
+        Cart.objects.select_for_update(skip_locked=True).filter(
+            status=CartStatusEnum.OPEN, updated_at__lt=updated_before,
+        ).order_by('updated_at', 'id').values_list('id', flat=True)[:limit]
+    )
+    if not cart_ids:
+        return 0, 0, 0
+
+    items = CartItem.objects.select_for_update().filter(cart_id__in=cart_ids).order_by('id').values_list(
+        'product_id', 'quantity',
+    )
+    released = Counter()
+    item_count = 0
+    for product_id, quantity in items:
+        released[product_id] += quantity
+        item_count += 1
+
+    rows = sorted((product_id, quantity) for product_id, quantity in released.items() if quantity)
+    if rows:
+        list(Product.objects.select_for_update().filter(id__in=[row[0] for row in rows]).order_by('id').values_list(
+            'id', flat=True,
+        ))
+
+        table = connection.ops.quote_name(Product._meta.db_table)
+        values = ', '.join(['(%s::bigint, %s::integer)'] * len(rows))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} AS product SET quantity = product.quantity + released.quantity, updated_at = %s '
+                f'FROM (VALUES {values}) AS released (id, quantity) WHERE product.id = released.id',
+                [timezone.now(), *(value for row in rows for value in row)],
+            )
+
+        # The raw UPDATE bypasses the post_save signal.
+        cache.bump_version(Product)
+
+    CartItem.objects.filter(cart_id__in=cart_ids).delete()
+    Cart.objects.filter(id__in=cart_ids).delete()
+
+    return len(cart_ids), item_count, sum(quantity for _, quantity in rows)
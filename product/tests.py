@@ -1,3 +1,1341 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import tempfile
+from base64 import urlsafe_b64encode
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
+from io import StringIO
 
-# Create your tests here.
+from django.core.cache import cache as django_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from account.models import User
+from product import cache
+from product.fast_serializers import CategoryValuesSerializer, ProductValuesSerializer, \
+    CartItemDetailValuesSerializer
+from product.enums import ProductUnitEnum, CartStatusEnum
+from product.models import Category, Product, Cart, CartItem, Comment, Order
+from product.pagination import EstimatedCountPaginator
+from product.serializers import CategorySerializer, ProductSerializer, CartItemDetailSerializer
+from product.stock import release_abandoned_carts
+
+
+class ProductTestMixin:
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+
+    @classmethod
+    def create_category(cls, title='Fruits'):
+        return Category.objects.create(title=title, icon='category/icon.png', description='')
+
+    @classmethod
+    def create_product(cls, category, index=0, price=100, quantity=10):
+        return Product.objects.create(
+            title=f'Product {index}',
+            slug=f'product-{index}',
+            description='',
+            image='product/image.png',
+            price=price,
+            unit=ProductUnitEnum.ONE,
+            quantity=quantity,
+            category=category,
+        )
+
+
+class ProductListViewTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index) for index in range(20)]
+        cls.user.favorite_products.add(*cls.products[:5])
+
+    def test_is_user_favorite_query_count(self):
+        self.client.force_authenticate(self.user)
+
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/shop/products/', {'size': 20})
+
+        favorites = {item['id'] for item in response.data['results'] if item['is_user_favorite']}
+        self.assertEqual(favorites, {product.id for product in self.products[:5]})
+
+    def test_favorite_list_query_count(self):
+        self.client.force_authenticate(self.user)
+
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/shop/products/favorites/', {'size': 20})
+
+        self.assertEqual(response.data['count'], 5)
+        self.assertTrue(all(item['is_user_favorite'] for item in response.data['results']))
+
+    def test_anonymous_user_has_no_favorites(self):
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/shop/products/', {'size': 20})
+
+        self.assertFalse(any(item['is_user_favorite'] for item in response.data['results']))
+
+    def test_admin_product_view_query_count(self):
+        self.client.force_authenticate(self.admin)
+        product_ids = [product.id for product in self.products]
+
+        with self.assertNumQueries(3):
+            response = self.client.put('/api/shop/admin/product/', {'product_ids': product_ids}, format='json')
+
+        self.assertEqual(len(response.data), len(product_ids))
+
+
+class CatalogCacheTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        cls.category = cls.create_category()
+        cls.products = [cls.create_product(cls.category, index) for index in range(5)]
+
+    def test_anonymous_product_list_is_cached(self):
+        response = self.client.get('/api/shop/products/', {'size': 2, 'ordering': 'price'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get('/api/shop/products/', {'ordering': 'price', 'size': 2})
+
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1})
+
+    def test_product_save_invalidates_cache(self):
+        self.client.get('/api/shop/products/', {'size': 10})
+
+        product = self.products[0]
+        product.price = 999
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+
+        response = self.client.get('/api/shop/products/', {'size': 10})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        prices = {item['id']: item['price'] for item in response.data['results']}
+        self.assertEqual(prices[product.id], 999)
+
+    def test_version_is_bumped_when_the_write_commits(self):
+        before = cache.get_versions([Product])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.products[0].save()
+                # A reader inside this window still sees the old version, so it can't cache old rows under the new one.
+                self.assertEqual(cache.get_versions([Product]), before)
+
+        self.assertNotEqual(cache.get_versions([Product]), before)
+
+    def test_category_delete_invalidates_cache(self):
+        category = self.create_category('Breads')
+        self.assertEqual(len(self.client.get('/api/shop/categories/').data), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            category.delete()
+
+        response = self.client.get('/api/shop/categories/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data), 1)
+
+    def test_authenticated_product_list_is_not_cached(self):
+        self.client.force_authenticate(self.user)
+        self.client.get('/api/shop/products/', {'size': 10})
+        response = self.client.get('/api/shop/products/', {'size': 10})
+
+        self.assertNotIn('X-Cache', response)
+
+
+class ConditionalGetTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        cls.category = cls.create_category()
+        cls.products = [cls.create_product(cls.category, index) for index in range(5)]
+
+    def test_product_list_not_modified(self):
+        response = self.client.get('/api/shop/products/', {'size': 2})
+        etag = response['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/shop/products/', {'size': 2}, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_product_list_etag_depends_on_query(self):
+        first = self.client.get('/api/shop/products/', {'size': 2})
+        second = self.client.get('/api/shop/products/', {'size': 2, 'page': 2})
+
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_product_save_changes_etag(self):
+        etag = self.client.get('/api/shop/products/', {'size': 2})['ETag']
+
+        self.products[0].price = 999
+        self.products[0].save()
+
+        response = self.client.get('/api/shop/products/', {'size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_favorite_change_changes_etag(self):
+        self.client.force_authenticate(self.user)
+        etag = self.client.get('/api/shop/products/', {'size': 2})['ETag']
+
+        self.user.favorite_products.add(self.products[0])
+
+        response = self.client.get('/api/shop/products/', {'size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_categories_not_modified(self):
+        etag = self.client.get('/api/shop/categories/')['ETag']
+        response = self.client.get('/api/shop/categories/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_cart_items_not_modified(self):
+        cart = Cart.objects.create(user=self.user, status=CartStatusEnum.OPEN)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=2)
+        self.client.force_authenticate(self.user)
+
+        etag = self.client.get(f'/api/shop/products/cart/{cart.id}/')['ETag']
+        response = self.client.get(f'/api/shop/products/cart/{cart.id}/', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+
+class ProductCursorListViewTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = cls.create_category()
+        other = cls.create_category('Breads')
+        prices = [300, 100, None, 200, 100, None, 300, 100, 50, 200]
+        cls.products = [
+            cls.create_product(cls.category if index % 2 else other, index, price=price)
+            for index, price in enumerate(prices)
+        ]
+
+    def walk(self, params):
+        ids = []
+        url = '/api/shop/products/cursor/'
+
+        while url:
+            response = self.client.get(url, params)
+            self.assertNotIn('count', response.data)
+            ids += [item['id'] for item in response.data['results']]
+            url, params = response.data['next'], None
+
+        return ids
+
+    def test_walk_by_price(self):
+        expected = sorted(self.products, key=lambda product: (product.price is None, product.price or 0, product.id))
+        self.assertEqual(self.walk({'size': 3, 'ordering': 'price'}), [product.id for product in expected])
+
+    def test_walk_by_price_descending(self):
+        expected = sorted(
+            self.products,
+            key=lambda product: (product.price is not None, -(product.price or 0), -product.id),
+        )
+        self.assertEqual(self.walk({'size': 3, 'ordering': '-price'}), [product.id for product in expected])
+
+    def test_walk_with_filters(self):
+        expected = [
+            product.id for product in sorted(self.products, key=lambda product: (product.price or 0, product.id))
+            if product.category_id == self.category.id and product.price and 100 <= product.price <= 300
+        ]
+        params = {'size': 2, 'ordering': 'price', 'category_id': self.category.id, 'min_price': 100, 'max_price': 300}
+
+        self.assertEqual(self.walk(params), expected)
+
+    def test_page_skips_count_query(self):
+        # Only the page itself: no COUNT(*) and no conditional GET fingerprint.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/shop/products/cursor/', {'size': 3, 'ordering': 'price'})
+
+        self.assertNotIn('ETag', response)
+
+    def test_cursor_predicate_has_index_start_key(self):
+        response = self.client.get('/api/shop/products/cursor/', {'size': 3, 'ordering': 'price'})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(response.data['next'])
+
+        # A top-level range on price lets product_price_idx start at the cursor instead of filtering up to it.
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"product_product"."price" >= ', queries[0]['sql'])
+        self.assertNotIn('IS NULL', queries[0]['sql'])
+
+    def test_null_segment_follows_non_null_rows(self):
+        # The second page runs out of priced products and continues with the NULL prices.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/shop/products/cursor/', {'size': 7, 'ordering': 'price'})
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(len(queries), 3)
+        self.assertEqual([item['price'] for item in response.data['results']], [300, None, None])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/shop/products/cursor/', {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_value_of_wrong_type(self):
+        cursor = urlsafe_b64encode(json.dumps(['abc', 1]).encode()).decode()
+        response = self.client.get('/api/shop/products/cursor/', {'cursor': cursor, 'ordering': 'price'})
+        self.assertEqual(response.status_code, 404)
+
+
+class FullTextSearchFilterTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = cls.create_category()
+        cls.tomato = cls.create_product(category, 0)
+        cls.tomato.title, cls.tomato.slug = 'Fresh Tomatoes', 'fresh-tomatoes'
+        cls.tomato.save()
+        cls.olive_oil = cls.create_product(category, 1)
+        cls.olive_oil.title, cls.olive_oil.slug = 'Olive Oil', 'extra-virgin'
+        cls.olive_oil.description = 'Goes well with tomato salad'
+        cls.olive_oil.save()
+
+    def search(self, **params):
+        response = self.client.get('/api/shop/products/', params)
+        return [item['id'] for item in response.data]
+
+    def test_search_matches_stemmed_prefix(self):
+        self.assertEqual(self.search(search='tomato'), [self.tomato.id, self.olive_oil.id])
+        self.assertEqual(self.search(search='oli'), [self.olive_oil.id])
+
+    def test_search_matches_slug(self):
+        self.assertEqual(self.search(search='virgin'), [self.olive_oil.id])
+
+    def test_search_respects_explicit_ordering(self):
+        self.olive_oil.price = 10
+        self.olive_oil.save()
+
+        self.assertEqual(self.search(search='tomato', ordering='price'), [self.olive_oil.id, self.tomato.id])
+
+    def test_search_escapes_terms(self):
+        response = self.client.get('/api/shop/products/', {'search': "tomato's\\ ':*|"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_fuzzy_search(self):
+        self.assertEqual(self.search(search='tomatoez'), [])
+        self.assertEqual(self.search(search='tomatoez', fuzzy='true'), [self.tomato.id])
+
+    def test_search_vector_is_set_on_bulk_create(self):
+        category = Category.objects.first()
+        Product.objects.bulk_create([
+            Product(title='Beef', slug='beef', description='', image='', unit='1', category=category),
+        ])
+
+        self.assertEqual(len(self.search(search='beef')), 1)
+
+
+class CartViewPutTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        cls.product = cls.create_product(cls.create_category(), quantity=10)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def put(self, quantity):
+        return self.client.put('/api/shop/products/cart/', {'product_id': self.product.id, 'quantity': quantity})
+
+    def test_reserve_and_release(self):
+        self.assertEqual(self.put(4).data['quantity'], 4)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 6)
+
+        self.assertEqual(self.put(1).data['quantity'], 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 9)
+
+    def test_reserve_all_remaining_stock_after_update(self):
+        self.put(6)
+        self.assertEqual(self.put(10).status_code, 200)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 0)
+
+    def test_insufficient_stock_is_conflict(self):
+        self.put(3)
+        response = self.put(11)
+
+        self.assertEqual(response.status_code, 409)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 7)
+        self.assertEqual(CartItem.objects.get().quantity, 3)
+
+    def test_invalid_quantity(self):
+        self.assertEqual(self.put(0).status_code, 400)
+
+
+class CartViewPutConcurrencyTest(ProductTestMixin, APITransactionTestCase):
+    stock = 25
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.create_product(self.create_category(), quantity=self.stock)
+        self.users = [User.objects.create_user(username=f'user{index}', password='password') for index in range(8)]
+
+    def put(self, user, quantity):
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            return client.put('/api/shop/products/cart/', {'product_id': self.product.id, 'quantity': quantity})
+        finally:
+            connection.close()
+
+    def run_parallel(self, requests):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            return list(executor.map(lambda args: self.put(*args), requests))
+
+    def assertStockConserved(self):
+        self.product.refresh_from_db()
+        reserved = CartItem.objects.aggregate(total=Sum('quantity', default=0))['total']
+
+        self.assertGreaterEqual(self.product.quantity, 0)
+        self.assertEqual(self.product.quantity + reserved, self.stock)
+
+    def test_parallel_reservations_never_oversell(self):
+        responses = self.run_parallel([(user, 4) for user in self.users] * 2)
+
+        self.assertTrue(all(response.status_code in (200, 409) for response in responses))
+        self.assertEqual(CartItem.objects.filter(quantity=4).count(), self.stock // 4)
+        self.assertEqual(CartItem.objects.count(), self.stock // 4)
+        self.assertStockConserved()
+
+    def test_parallel_updates_of_one_line_are_not_double_counted(self):
+        user = self.users[0]
+        self.run_parallel([(user, quantity) for quantity in [1, 5, 3, 7, 2, 6, 4, 8] * 4])
+
+        self.assertEqual(Cart.objects.filter(user=user).count(), 1)
+        self.assertStockConserved()
+
+    def test_puts_racing_the_reaper(self):
+        user = self.users[0]
+        self.put(user, 3)
+        Cart.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        def reap():
+            try:
+                call_command('release_abandoned_carts', '--batch-size', 1, stdout=StringIO())
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            reaper = executor.submit(reap)
+            responses = list(executor.map(lambda quantity: self.put(user, quantity), [1, 5, 2, 4] * 2))
+            reaper.result()
+
+        # Writers either finish before the cart is released or start a new one; none of them fail.
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(Cart.objects.filter(user=user, status=CartStatusEnum.OPEN).count(), 1)
+        self.assertStockConserved()
+
+
+class CartBulkViewTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, quantity=10) for index in range(5)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def put(self, quantities):
+        items = [{'product_id': product.id, 'quantity': quantity} for product, quantity in quantities.items()]
+        return self.client.put('/api/shop/products/cart/bulk/', {'items': items}, format='json')
+
+    def stock(self):
+        return [product.quantity for product in Product.objects.order_by('id')]
+
+    def test_sync_cart(self):
+        first, second, third = self.products[:3]
+        self.put({first: 2, second: 3})
+
+        response = self.put({first: 5, second: 0, third: 1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['product_id'], item['quantity']) for item in response.data],
+            [(first.id, 5), (third.id, 1)],
+        )
+        self.assertEqual(self.stock(), [5, 10, 9, 10, 10])
+
+    def test_query_count_is_independent_of_item_count(self):
+        # One conditional stock update per product on top of a fixed number of queries, including the cart lock
+        # and its updated_at touch.
+        with self.assertNumQueries(13 + len(self.products)):
+            self.put({product: 1 for product in self.products})
+
+    def test_insufficient_stock_rolls_back_everything(self):
+        first, second = self.products[:2]
+        response = self.put({first: 2, second: 11})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.stock(), [10] * 5)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_unknown_product(self):
+        response = self.client.put(
+            '/api/shop/products/cart/bulk/', {'items': [{'product_id': 0, 'quantity': 1}]}, format='json',
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_duplicate_products(self):
+        items = [{'product_id': self.products[0].id, 'quantity': 1}] * 2
+        response = self.client.put('/api/shop/products/cart/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CartViewGetTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100 * (index + 1)) for index in range(5)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def test_empty_cart(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/shop/products/cart/')
+
+        self.assertEqual(response.data, {'item_counts': 0, 'total_price': 0.0, 'items': []})
+
+    def test_cart_summary_query_count(self):
+        cart = Cart.objects.create(user=self.user, status=CartStatusEnum.OPEN)
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=2) for product in self.products)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/shop/products/cart/')
+
+        self.assertEqual(response.data['item_counts'], 10)
+        self.assertEqual(response.data['total_price'], 2 * (100 + 200 + 300 + 400 + 500))
+
+        line = response.data['items'][0]
+        self.assertEqual(line['product']['title'], self.products[0].title)
+        self.assertEqual(line['product']['price'], 100)
+        self.assertTrue(line['product']['image'].endswith('product/image.png'))
+        self.assertEqual(line['total_price'], 200)
+
+    def test_closed_cart_is_ignored(self):
+        cart = Cart.objects.create(user=self.user, status=CartStatusEnum.CLOSED)
+        CartItem.objects.create(cart=cart, product=self.products[0], quantity=1)
+
+        self.assertEqual(self.client.get('/api/shop/products/cart/').data['items'], [])
+
+
+class ProductRatingTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'user{index}', password='password') for index in range(3)]
+        cls.product = cls.create_product(cls.create_category())
+
+    def comment(self, user, rate):
+        self.client.force_authenticate(user)
+        return self.client.post(f'/api/shop/products/{self.product.id}/comment/', {'rate': rate, 'content': 'ok'})
+
+    def delete_comment(self, user):
+        self.client.force_authenticate(user)
+        return self.client.delete(f'/api/shop/products/{self.product.id}/comment/')
+
+    def assertRating(self, rate, rate_sum, rate_count):
+        self.product.refresh_from_db()
+        self.assertEqual(
+            (self.product.rate, self.product.rate_sum, self.product.rate_count),
+            (rate, rate_sum, rate_count),
+        )
+
+    def test_rating_follows_comments(self):
+        self.comment(self.users[0], 5)
+        self.comment(self.users[1], 4)
+        self.assertRating(5, 9, 2)
+
+        self.comment(self.users[2], 1)
+        self.assertRating(3, 10, 3)
+
+        self.delete_comment(self.users[2])
+        self.delete_comment(self.users[1])
+        self.assertRating(5, 5, 1)
+
+        self.delete_comment(self.users[0])
+        self.assertRating(0, 0, 0)
+
+    def test_rebuild_ratings(self):
+        Comment.objects.bulk_create(
+            Comment(product=self.product, user=user, rate=rate, content='ok')
+            for user, rate in zip(self.users, [5, 4, 4])
+        )
+        # 3.5 rounds half up, like the incremental update.
+        half = self.create_product(Category.objects.get(), 2)
+        Comment.objects.bulk_create(
+            Comment(product=half, user=user, rate=rate, content='ok') for user, rate in zip(self.users, [3, 4])
+        )
+        other = self.create_product(Category.objects.get(), 1)
+        Product.objects.filter(id=other.id).update(rate=3, rate_sum=3, rate_count=1)
+
+        call_command('rebuild_ratings', batch_size=1, stdout=StringIO())
+
+        self.assertRating(4, 13, 3)
+        half.refresh_from_db()
+        self.assertEqual(half.rate, 4)
+        other.refresh_from_db()
+        self.assertEqual((other.rate, other.rate_sum, other.rate_count), (0, 0, 0))
+
+
+class CommentListTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f'user{index}', password='password') for index in range(7)]
+        cls.product = cls.create_product(cls.create_category())
+        cls.comments = [
+            Comment.objects.create(product=cls.product, user=user, rate=3, content=f'comment {index}')
+            for index, user in enumerate(cls.users)
+        ]
+
+    def url(self):
+        return f'/api/shop/products/{self.product.id}/comment/'
+
+    def test_walk_newest_first(self):
+        ids, params, url = [], {'size': 3}, self.url()
+
+        while url:
+            response = self.client.get(url, params)
+            ids += [item['id'] for item in response.data['results']]
+            url, params = response.data['next'], None
+
+        self.assertEqual(ids, [comment.id for comment in reversed(self.comments)])
+
+    def test_first_page_is_cached(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url(), {'size': 3})
+
+        self.assertEqual(response.data['results'][0]['username'], 'user6')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url(), {'size': 3}).data, response.data)
+
+    def test_comment_delete_invalidates_first_page(self):
+        self.client.get(self.url())
+
+        self.client.force_authenticate(self.users[-1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url())
+
+        response = self.client.get(self.url())
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['username'], 'user5')
+
+    def test_cursor_value_of_wrong_type(self):
+        cursor = urlsafe_b64encode(json.dumps(['abc', 1]).encode()).decode()
+        self.assertEqual(self.client.get(self.url(), {'cursor': cursor}).status_code, 404)
+
+    def test_missing_product(self):
+        response = self.client.get('/api/shop/products/0/comment/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data, {'message': 'Product not found.'})
+
+    def test_product_without_comments(self):
+        product = self.create_product(self.product.category, 1)
+        response = self.client.get(f'/api/shop/products/{product.id}/comment/')
+        self.assertEqual(response.data, {'next': None, 'results': []})
+
+
+class ImportProductsCommandTest(ProductTestMixin, APITestCase):
+    def test_import_csv_upserts_in_batches(self):
+        category = self.create_category()
+        self.create_product(category, 0, price=1)
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='') as file:
+            writer = csv.DictWriter(file, ['title', 'slug', 'price', 'quantity', 'unit', 'category'])
+            writer.writeheader()
+            writer.writerows([
+                {'title': 'Product 0', 'slug': 'product-0', 'price': 50, 'quantity': 3, 'category': 'Fruits'},
+                {'title': 'Olive Oil', 'price': 20, 'unit': '1kg', 'category': 'Oils'},
+                {'title': 'Bread', 'price': -1, 'category': 'Fruits'},
+                {'title': 'Olive Oil', 'price': 25, 'unit': '1kg', 'category': 'Oils'},
+            ])
+            file.flush()
+
+            stderr = StringIO()
+            call_command(
+                'import_products', file.name, batch_size=2, create_categories=True, stdout=StringIO(), stderr=stderr,
+            )
+
+        self.assertEqual(Product.objects.count(), 2)
+        self.assertEqual(Product.objects.get(slug='product-0').price, 50)
+        self.assertEqual(Product.objects.get(slug='olive-oil').price, 25)
+        self.assertEqual(Product.objects.get(slug='olive-oil').category.title, 'Oils')
+        self.assertIn('line 4: invalid price -1', stderr.getvalue())
+
+    def test_import_jsonl_with_workers(self):
+        self.create_category()
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            for index in range(10):
+                file.write(json.dumps({'title': f'Item {index}', 'price': index, 'category': 'Fruits'}) + '\n')
+            file.write('{broken\n')
+            file.flush()
+
+            stderr = StringIO()
+            call_command('import_products', file.name, batch_size=3, workers=2, stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(Product.objects.count(), 10)
+        self.assertIn('line 11: invalid JSON', stderr.getvalue())
+
+    def test_out_of_range_rows_are_skipped(self):
+        self.create_category()
+        records = [
+            {'title': 'x' * 129, 'category': 'Fruits'},
+            {'title': 'Apple', 'slug': 'a' * 129, 'category': 'Fruits'},
+            {'title': 'Pear', 'quantity': 10 ** 12, 'category': 'Fruits'},
+            {'title': 'Plum', 'quantity': -1, 'category': 'Fruits'},
+            {'title': 'Fig', 'price': 2 ** 63, 'category': 'Fruits'},
+            {'title': 'Kiwi', 'category': 'c' * 129},
+            {'title': 'Lime', 'price': 10, 'quantity': 3, 'category': 'Fruits'},
+        ]
+
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.writelines(json.dumps(record) + '\n' for record in records)
+            file.flush()
+
+            stdout, stderr = StringIO(), StringIO()
+            call_command(
+                'import_products', file.name, create_categories=True, stdout=stdout, stderr=stderr,
+            )
+
+        self.assertEqual(list(Product.objects.values_list('title', flat=True)), ['Lime'])
+        self.assertIn('Imported 1 rows (6 skipped)', stdout.getvalue())
+        for message in ('title longer than 128', 'slug longer than 128', 'invalid quantity 1000000000000',
+                        'invalid quantity -1', f'invalid price {2 ** 63}', 'category longer than 128'):
+            self.assertIn(message, stderr.getvalue())
+
+
+class ProductExportTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100 * index) for index in range(5)]
+
+    def export(self, **params):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get('/api/shop/admin/product/export/', params)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_csv(self):
+        response, content = self.export(min_price=200)
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(content.decode())))
+        self.assertEqual([int(row['id']) for row in rows], [product.id for product in self.products[2:]])
+        self.assertEqual(rows[0]['title'], 'Product 2')
+
+    def test_export_gzipped_jsonl(self):
+        response, content = self.export(output='jsonl', gzip='true', ordering='-price', max_price=200)
+
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="products.jsonl.gz"')
+        rows = [json.loads(line) for line in gzip.decompress(content).splitlines()]
+        self.assertEqual([row['price'] for row in rows], [200, 100, 0])
+
+    def test_export_is_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='user', password='password'))
+        self.assertEqual(self.client.get('/api/shop/admin/product/export/').status_code, 403)
+
+    def test_export_command(self):
+        with tempfile.NamedTemporaryFile(suffix='.jsonl') as file:
+            call_command('export_products', output=file.name, format='jsonl', min_price=300, stderr=StringIO())
+            rows = [json.loads(line) for line in file.read().splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [product.id for product in self.products[3:]])
+
+
+class AsyncViewsTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100 * (index + 1)) for index in range(5)]
+        cls.user.favorite_products.add(cls.products[0])
+
+        cart = Cart.objects.create(user=cls.user, status=CartStatusEnum.OPEN)
+        CartItem.objects.create(cart=cart, product=cls.products[1], quantity=3)
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def assertSameResponse(self, path, params=None):
+        response = self.client.get(f'/api/shop/{path}', params)
+        async_response = self.client.get(f'/api/async/shop/{path}', params)
+
+        self.assertEqual(async_response.status_code, response.status_code)
+        # Pagination links point at the endpoint that served them.
+        self.assertEqual(json.loads(async_response.content.replace(b'/async/', b'/')), response.json())
+
+    def test_categories(self):
+        self.assertSameResponse('categories/')
+
+    def test_products(self):
+        self.assertSameResponse('products/')
+        self.assertSameResponse('products/', {'size': 2, 'ordering': '-price', 'min_price': 200})
+        self.assertSameResponse('products/', {'size': 2, 'page': 2})
+        self.assertSameResponse('products/', {'size': 2, 'page': 9})
+        self.assertSameResponse('products/', {'min_price': 'abc'})
+
+    def test_cart(self):
+        self.assertSameResponse('products/cart/')
+
+    def test_cart_requires_authentication(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get('/api/async/shop/products/cart/').status_code, 401)
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(self.client.get('/api/async/shop/products/cart/').status_code, 401)
+
+
+@override_settings(THUMBNAIL_WIDTHS=[160, 320], THUMBNAIL_WORKERS=0)
+class ThumbnailTest(ProductTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root.name))
+
+        self.category = self.create_category()
+
+    @staticmethod
+    def save_image(name, size=(800, 400)):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_thumbnails_are_generated_on_upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.create_product(self.category)
+            product.image = self.save_image('product/photo.png')
+            product.save()
+
+        product.refresh_from_db()
+        self.assertEqual(set(product.thumbnails), {'source', '160', '320'})
+
+        with default_storage.open(product.thumbnails['160']) as file, Image.open(file) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (160, 80)))
+
+        item = self.client.get('/api/shop/products/').data[0]
+        self.assertEqual(
+            item['thumbnails']['320'], 'http://testserver/media/thumbnails/product/photo-320w.webp',
+        )
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            category = Category.objects.create(title='Herbs', icon=self.save_image('category/icon.png', (100, 50)))
+
+        category.refresh_from_db()
+        with default_storage.open(category.thumbnails['320']) as file, Image.open(file) as image:
+            self.assertEqual(image.size, (100, 50))
+
+    def test_stale_thumbnails_are_hidden_and_backfilled(self):
+        product = self.create_product(self.category)
+        Product.objects.filter(pk=product.pk).update(
+            image=self.save_image('product/new.png'), thumbnails={'source': 'product/old.png', '160': 'old.webp'},
+        )
+        self.assertEqual(self.client.get('/api/shop/products/').data[0]['thumbnails'], {})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('generate_thumbnails', model=['product'], workers=1, stdout=StringIO())
+
+        product.refresh_from_db()
+        self.assertEqual(product.thumbnails['source'], 'product/new.png')
+        self.assertIn('160', self.client.get('/api/shop/products/').data[0]['thumbnails'])
+
+
+class ValuesSerializerTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100 * index or None) for index in range(3)]
+        cls.user.favorite_products.add(cls.products[1])
+
+        Product.objects.filter(pk=cls.products[0].pk).update(
+            image='', thumbnails={'source': 'product/image.png', '160': 'thumbnails/product/image-160w.webp'},
+        )
+        Product.objects.filter(pk=cls.products[1].pk).update(
+            thumbnails={'source': 'product/image.png', '160': 'thumbnails/product/image-160w.webp'},
+        )
+        Product.objects.filter(pk=cls.products[2].pk).update(image='product/summer fruit ü.png')
+        Category.objects.update(thumbnails={'source': 'category/icon.png', '160': 'thumbnails/category/icon-160w.webp'})
+
+        cart = Cart.objects.create(user=cls.user, status=CartStatusEnum.OPEN)
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=2) for product in cls.products)
+
+    def assertSameJson(self, serializer_class, values_serializer_class, queryset, context=None):
+        context = context or {}
+        expected = serializer_class(queryset, many=True, context=context).data
+        data = values_serializer_class(values_serializer_class.values(queryset), many=True, context=context).data
+
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_products(self):
+        request = Request(APIRequestFactory().get('/api/shop/products/'))
+        queryset = Product.objects.with_is_user_favorite(self.user).order_by('id')
+
+        self.assertSameJson(ProductSerializer, ProductValuesSerializer, queryset, {'request': request})
+        self.assertSameJson(ProductSerializer, ProductValuesSerializer, queryset, {'user': self.user})
+
+    def test_categories(self):
+        self.assertSameJson(CategorySerializer, CategoryValuesSerializer, Category.objects.all())
+
+    def test_cart_items(self):
+        queryset = CartItem.objects.annotate(total_price=F('quantity') * F('product__price')).order_by('id')
+        self.assertSameJson(CartItemDetailSerializer, CartItemDetailValuesSerializer, queryset)
+
+
+class AdminChangelistTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index) for index in range(10)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def create_cart_items(self, count):
+        for index in range(count):
+            user = User.objects.create_user(username=f'user-{User.objects.count()}', password='password')
+            cart = Cart.objects.create(user=user, status=CartStatusEnum.OPEN)
+            CartItem.objects.create(cart=cart, product=self.products[index], quantity=1)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for url in ('/admin/product/cartitem/', '/admin/product/cart/', '/admin/product/product/'):
+            self.create_cart_items(2)
+            before = self.count_queries(url)
+            self.create_cart_items(5)
+            self.assertEqual(self.count_queries(url), before, url)
+
+    def test_exact_searches_use_plain_lookups(self):
+        self.create_cart_items(3)
+        cart = Cart.objects.order_by('id').select_related('user').last()
+
+        for url, term, expected in (
+            ('/admin/product/cartitem/', str(cart.id), 1),
+            ('/admin/product/cartitem/', cart.user.username, 1),
+            ('/admin/product/cart/', cart.user.username, 1),
+            ('/admin/product/cart/', cart.user.username.upper(), 0),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, {'q': term})
+
+            self.assertEqual(response.context['cl'].result_count, expected, (url, term))
+            self.assertFalse([query['sql'] for query in queries if 'UPPER(' in query['sql']], (url, term))
+
+    def test_large_unfiltered_changelist_uses_the_estimate(self):
+        with mock.patch.object(EstimatedCountPaginator, 'get_estimate', return_value=2_000_000) as get_estimate:
+            response = self.client.get('/admin/product/product/')
+            self.assertEqual(response.context['cl'].result_count, 2_000_000)
+
+            response = self.client.get('/admin/product/product/', {'q': 'Product 1'})
+            self.assertEqual(response.context['cl'].result_count, 1)
+
+        get_estimate.assert_called_once()
+
+    def test_estimate_reads_planner_statistics(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE product_product')
+
+        self.assertIsInstance(EstimatedCountPaginator.get_estimate(Product.objects.all()), int)
+
+
+class AdminInventoryViewTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100, quantity=10) for index in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def patch(self, changes):
+        return self.client.patch('/api/shop/admin/product/inventory/', {'changes': changes}, format='json')
+
+    def test_absolute_and_delta_changes(self):
+        first, second, third = self.products
+
+        with self.assertNumQueries(4):
+            response = self.patch([
+                {'product_id': third.id, 'quantity': 0},
+                {'product_id': first.id, 'quantity_delta': -4, 'price': 250},
+                {'product_id': second.id, 'quantity_delta': 5, 'price_delta': -30},
+            ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'id': first.id, 'quantity': 6, 'price': 250},
+            {'id': second.id, 'quantity': 15, 'price': 70},
+            {'id': third.id, 'quantity': 0, 'price': 100},
+        ])
+        self.assertEqual(
+            list(Product.objects.order_by('id').values_list('quantity', 'price')), [(6, 250), (15, 70), (0, 100)],
+        )
+
+    def test_invalid_changes_write_nothing(self):
+        first, second, _ = self.products
+
+        response = self.patch([
+            {'product_id': first.id, 'quantity': 1},
+            {'product_id': second.id, 'quantity_delta': -11},
+            {'product_id': 0, 'price': 1},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {
+            second.id: 'Quantity would become negative.',
+            0: 'Product not found.',
+        })
+        self.assertEqual(Product.objects.get(pk=first.pk).quantity, 10)
+
+    def test_request_validation(self):
+        product_id = self.products[0].id
+
+        for changes in (
+            [{'product_id': product_id, 'quantity': 1, 'quantity_delta': 1}],
+            [{'product_id': product_id}],
+            [{'product_id': product_id, 'quantity': 1}, {'product_id': product_id, 'price': 1}],
+            [{'product_id': product_id, 'price': -1}],
+            [{'product_id': product_id, 'quantity': 2 ** 31}],
+            [{'product_id': product_id, 'quantity_delta': 2 ** 31}],
+            [{'product_id': product_id, 'price': 2 ** 63}],
+        ):
+            self.assertEqual(self.patch(changes).status_code, 400, changes)
+
+    def test_overflowing_results_are_rejected(self):
+        first, second, _ = self.products
+        Product.objects.filter(pk=second.pk).update(price=2 ** 63 - 10)
+
+        response = self.patch([
+            {'product_id': first.id, 'quantity_delta': 2 ** 31 - 1},
+            {'product_id': second.id, 'price_delta': 10},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {
+            first.id: 'Quantity would overflow.',
+            second.id: 'Price would overflow.',
+        })
+
+    def test_staff_only(self):
+        self.client.force_authenticate(User.objects.create_user(username='user', password='password'))
+        self.assertEqual(self.patch([{'product_id': self.products[0].id, 'quantity': 1}]).status_code, 403)
+
+    def test_large_batch_is_one_update(self):
+        category = Category.objects.first()
+        Product.objects.bulk_create(
+            Product(
+                title=f'Bulk {index}',
+                slug=f'bulk-{index}',
+                description='',
+                image='',
+                price=10,
+                unit=ProductUnitEnum.ONE,
+                quantity=0,
+                category=category,
+            )
+            for index in range(3_000)
+        )
+        product_ids = Product.objects.values_list('id', flat=True)
+        changes = [{'product_id': product_id, 'quantity_delta': 7} for product_id in product_ids]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch(changes)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 3_003)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 1)
+        self.assertEqual(Product.objects.filter(title__startswith='Bulk', quantity=7).count(), 3_000)
+
+
+class FavoriteProductTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index) for index in range(5)]
+        cls.user.favorite_products.add(cls.products[0])
+
+    def setUp(self):
+        super().setUp()
+        # Authenticate through CachedJWTAuthentication so stale cached favorites would show up.
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def get_ids(self):
+        response = self.client.get('/api/shop/products/favorites/ids/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['ids']
+
+    def test_ids(self):
+        self.assertEqual(self.get_ids(), [self.products[0].id])
+
+        # Served from the cached user without touching the database.
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_ids(), [self.products[0].id])
+
+    def test_add_is_one_statement(self):
+        product_id = self.products[1].id
+        self.get_ids()
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/shop/products/favorites/{product_id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['INSERT'])
+        self.assertEqual(self.get_ids(), [self.products[0].id, product_id])
+
+    def test_add_existing_and_missing(self):
+        response = self.client.post(f'/api/shop/products/favorites/{self.products[0].id}/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['message'], 'Product already exists.')
+
+        for product_id in (0, 'abc'):
+            response = self.client.post(f'/api/shop/products/favorites/{product_id}/')
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.data['message'], 'Product not found.')
+
+    def test_remove_is_one_statement(self):
+        product_id = self.products[0].id
+        self.get_ids()
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/shop/products/favorites/{product_id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['DELETE'])
+        self.assertEqual(self.get_ids(), [])
+        self.assertEqual(self.client.delete(f'/api/shop/products/favorites/{product_id}/').status_code, 404)
+
+    def test_sync(self):
+        first, second, third, fourth, _ = self.products
+        self.user.favorite_products.add(second)
+        self.get_ids()
+
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/shop/products/favorites/sync/',
+                {'add': [first.id, third.id, fourth.id, 10 ** 9], 'remove': [second.id]},
+                format='json',
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'added': 2, 'removed': 1, 'not_found': [10 ** 9]})
+        # One existence check, one INSERT ... ON CONFLICT DO NOTHING and one DELETE.
+        statements = [query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(statements, ['SELECT', 'INSERT', 'DELETE'])
+        self.assertEqual(self.get_ids(), [first.id, third.id, fourth.id])
+
+    def test_sync_validation(self):
+        product_id = self.products[1].id
+
+        for body in (
+            {},
+            {'add': [product_id], 'remove': [product_id]},
+            {'add': list(range(1, 1002))},
+            {'remove': ['abc']},
+        ):
+            response = self.client.post('/api/shop/products/favorites/sync/', body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+class ReleaseAbandonedCartsTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, quantity=10) for index in range(3)]
+
+    def create_cart(self, quantities, age=timedelta(days=2)):
+        user = User.objects.create(username=f'user-{User.objects.count()}')
+        cart = Cart.objects.create(user=user, status=CartStatusEnum.OPEN)
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now() - age)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=quantity)
+            for product, quantity in zip(self.products, quantities)
+        )
+        return cart
+
+    def test_releases_stock_of_old_open_carts(self):
+        self.create_cart([1, 2, 3])
+        self.create_cart([4, 0, 1])
+        fresh = self.create_cart([5, 5, 5], age=timedelta(hours=1))
+        closed = self.create_cart([2, 2, 2])
+        Cart.objects.filter(pk=closed.pk).update(status=CartStatusEnum.CLOSED)
+
+        out = StringIO()
+        call_command('release_abandoned_carts', '--batch-size', 1, stdout=out)
+
+        self.assertIn('Released 2 carts (6 items, 11 units) in 2 batches', out.getvalue())
+        self.assertEqual(list(Product.objects.order_by('id').values_list('quantity', flat=True)), [15, 12, 14])
+        self.assertEqual(set(Cart.objects.values_list('id', flat=True)), {fresh.id, closed.id})
+        self.assertEqual(CartItem.objects.count(), 6)
+
+    def test_recently_changed_cart_is_kept(self):
+        cart = self.create_cart([1, 0, 0])
+        Cart.objects.filter(pk=cart.pk).update(created_at=timezone.now() - timedelta(days=2))
+        self.client.force_authenticate(cart.user)
+        self.client.put('/api/shop/products/cart/', {'product_id': self.products[1].id, 'quantity': 2})
+
+        call_command('release_abandoned_carts', stdout=StringIO())
+
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertEqual(list(Product.objects.order_by('id').values_list('quantity', flat=True)), [10, 8, 10])
+
+    def test_one_grouped_update_per_batch(self):
+        for _ in range(20):
+            self.create_cart([1, 1, 1])
+
+        with CaptureQueriesContext(connection) as queries, transaction.atomic():
+            result = release_abandoned_carts(timezone.now() - timedelta(days=1), 100)
+
+        self.assertEqual(result, (20, 60, 60))
+        self.assertEqual(sum(query['sql'].startswith('UPDATE "product_product"') for query in queries), 1)
+        self.assertEqual(list(Product.objects.order_by('id').values_list('quantity', flat=True)), [30, 30, 30])
+
+
+class CheckoutTest(ProductTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', password='password')
+        category = cls.create_category()
+        cls.products = [cls.create_product(category, index, price=100 * (index + 1)) for index in range(3)]
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self):
+        items = [{'product_id': product.id, 'quantity': index + 1} for index, product in enumerate(self.products)]
+        response = self.client.put('/api/shop/products/cart/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_checkout_snapshots_lines_and_totals(self):
+        self.fill_cart()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/shop/products/cart/checkout/')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['item_count'], 6)
+        self.assertEqual(response.data['total_price'], 100 + 2 * 200 + 3 * 300)
+        self.assertEqual(
+            [(line['product_id'], line['unit_price'], line['quantity']) for line in response.data['lines']],
+            [(product.id, 100 * (index + 1), index + 1) for index, product in enumerate(self.products)],
+        )
+        self.assertEqual(sum('INSERT' in query['sql'] and 'SELECT' in query['sql'] for query in queries), 1)
+        self.assertEqual(Cart.objects.get().status, CartStatusEnum.CLOSED)
+
+        # History keeps the checkout prices.
+        Product.objects.update(price=1)
+        response = self.client.get('/api/shop/products/orders/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['total_price'], 1400)
+
+        # A new open cart can be started after checkout.
+        self.fill_cart()
+        self.assertEqual(Cart.objects.filter(status=CartStatusEnum.OPEN).count(), 1)
+
+    def test_empty_cart(self):
+        self.assertEqual(self.client.post('/api/shop/products/cart/checkout/').status_code, 400)
+
+        Cart.objects.create(user=self.user, status=CartStatusEnum.OPEN)
+        self.assertEqual(self.client.post('/api/shop/products/cart/checkout/').status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(Cart.objects.get().status, CartStatusEnum.OPEN)
+
+    def test_history_query_count(self):
+        for _ in range(3):
+            self.fill_cart()
+            self.client.post('/api/shop/products/cart/checkout/')
+
+        # Count, orders and their lines, whatever the number of orders.
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/shop/products/orders/', {'size': 2})
+
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([len(order['lines']) for order in response.data['results']], [3, 3])
+        ids = [order['id'] for order in response.data['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_history_is_per_user(self):
+        self.fill_cart()
+        self.client.post('/api/shop/products/cart/checkout/')
+
+        self.client.force_authenticate(User.objects.create_user(username='other', password='password'))
+        self.assertEqual(self.client.get('/api/shop/products/orders/').data['count'], 0)
+
+
+class CheckoutConcurrencyTest(ProductTestMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.products = [self.create_product(self.create_category(), index, quantity=100) for index in range(3)]
+        self.user = User.objects.create_user(username='user', password='password')
+
+    def request(self, method, url, data=None):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        try:
+            return getattr(client, method)(url, data, format='json')
+        finally:
+            connection.close()
+
+    def test_puts_racing_checkout_are_never_lost(self):
+        def put(quantity):
+            items = [{'product_id': product.id, 'quantity': quantity} for product in self.products]
+            return self.request('put', '/api/shop/products/cart/bulk/', {'items': items})
+
+        put(1)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            puts = [executor.submit(put, quantity) for quantity in [2, 3, 4, 5, 6, 7]]
+            checkouts = [executor.submit(self.request, 'post', '/api/shop/products/cart/checkout/') for _ in range(2)]
+            responses = [future.result() for future in puts + checkouts]
+
+        self.assertTrue(all(response.status_code in (200, 201, 400) for response in responses))
+
+        # Every closed cart's lines are exactly what its order snapshotted.
+        for order in Order.objects.select_related('cart'):
+            items = CartItem.objects.filter(cart=order.cart).aggregate(total=Sum('quantity', default=0))['total']
+            self.assertEqual(order.item_count, items)
+
+        reserved = CartItem.objects.aggregate(total=Sum('quantity', default=0))['total']
+        self.assertEqual(Product.objects.aggregate(total=Sum('quantity'))['total'] + reserved, 300)
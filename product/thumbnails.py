@@ -0,0 +1,121 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from typing import Callable
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db import connections, transaction
+from django.db.models import Model
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from product import cache
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIRECTORY = 'thumbnails'
+THUMBNAIL_QUALITY = 80
+
+_executor = None
+
+
+def get_widths() -> list[int]:
+    return list(getattr(settings, 'THUMBNAIL_WIDTHS', [160, 320, 640]))
+
+
+def thumbnail_name(name: str, width: int) -> str:
+    path = PurePosixPath(name)
+    return str(PurePosixPath(THUMBNAIL_DIRECTORY, path.parent, f'{path.stem}-{width}w.webp'))
+
+
+def render_thumbnails(storage: Storage, name: str, widths: list[int]) -> dict:
+    """
+    Write one WebP per width under `thumbnails/` in `storage` and return `{'source': name, '<width>': path}`.
+    Images are never upscaled, so widths above the original share the original-size rendition.
+    """
+    with storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.mode else 'RGB')
+
+        thumbnails = {'source': name}
+        for width in sorted(set(widths)):
+            resized = image if width >= image.width else image.resize(
+                (width, max(round(image.height * width / image.width), 1)), Image.Resampling.LANCZOS,
+            )
+
+            buffer = BytesIO()
+            resized.save(buffer, 'WEBP', quality=THUMBNAIL_QUALITY, method=4)
+
+            path = thumbnail_name(name, width)
+            storage.delete(path)
+            thumbnails[str(width)] = storage.save(path, ContentFile(buffer.getvalue()))
+
+    return thumbnails
+
+
+def generate_thumbnails(model: type[Model], pk, field_name: str) -> bool:
+    """Render the thumbnails of one row and cache their paths on it; returns False when there was nothing to do."""
+    name = model.objects.filter(pk=pk).values_list(field_name, flat=True).first()
+    if not name:
+        return False
+
+    field = model._meta.get_field(field_name)
+    try:
+        thumbnails = render_thumbnails(field.storage, name, get_widths())
+    except (OSError, UnidentifiedImageError) as error:
+        logger.warning('Cannot render thumbnails of %s %s: %s', model._meta.label, name, error)
+        return False
+
+    # Skip the write when the file was replaced meanwhile; that upload scheduled its own run.
+    updated = model.objects.filter(pk=pk, **{field_name: name}).update(
+        thumbnails=thumbnails, updated_at=timezone.now(),
+    )
+    if updated:
+        # update() sends no signals, so invalidate the catalog cache by hand.
+        cache.bump_version(model)
+
+    return bool(updated)
+
+
+def _generate_in_worker(model, pk, field_name):
+    try:
+        generate_thumbnails(model, pk, field_name)
+    finally:
+        # Worker threads own their connections; don't leave them open between jobs.
+        connections.close_all()
+
+
+def schedule_thumbnails(instance: Model, field_name: str) -> None:
+    """Render thumbnails once the surrounding transaction commits, on the background pool unless disabled."""
+    global _executor
+
+    model, pk = type(instance), instance.pk
+    workers = getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+    if workers <= 0:
+        transaction.on_commit(lambda: generate_thumbnails(model, pk, field_name))
+        return
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnails')
+
+    transaction.on_commit(lambda: _executor.submit(_generate_in_worker, model, pk, field_name))
+
+
+def thumbnail_urls(thumbnails: dict | None, source: str, get_url: Callable[[str], str]) -> dict:
+    """`{width: get_url(path)}` of the renditions of `source`."""
+    thumbnails = thumbnails or {}
+    # Renditions of a replaced file are stale until the new ones are written.
+    if not source or thumbnails.get('source') != source:
+        return {}
+
+    return {width: get_url(name) for width, name in thumbnails.items() if width != 'source'}
+
+
+def needs_thumbnails(instance: Model, field_name: str) -> bool:
+    name = getattr(instance, field_name).name
+    return bool(name) and (instance.thumbnails or {}).get('source') != name
@@ -1,15 +1,26 @@
 from django.urls import path
 
 from product.views import CategoriesView, ProductListView, FavoriteProductListView, FavoriteProductDetailView, CartView, \
-    CommentView, AdminProductView, CartItemListView
+    CommentView, AdminProductView, CartItemListView, CatalogCacheStatsView, ProductCursorListView, CartBulkView, \
+    ProductExportView, AdminInventoryView, FavoriteProductIdsView, FavoriteProductSyncView, \
+    CheckoutView, OrderListView
 
 urlpatterns = [
     path('categories/', CategoriesView.as_view()),
     path('products/', ProductListView.as_view()),
+    path('products/cursor/', ProductCursorListView.as_view()),
     path('products/favorites/', FavoriteProductListView.as_view()),
+    path('products/favorites/ids/', FavoriteProductIdsView.as_view()),
+    path('products/favorites/sync/', FavoriteProductSyncView.as_view()),
     path('products/favorites/<str:product_id>/', FavoriteProductDetailView.as_view()),
     path('products/cart/', CartView.as_view()),
+    path('products/cart/bulk/', CartBulkView.as_view()),
+    path('products/cart/checkout/', CheckoutView.as_view()),
     path('products/cart/<int:cart_id>/', CartItemListView.as_view()),
+    path('products/orders/', OrderListView.as_view()),
     path('products/<int:product_id>/comment/', CommentView.as_view()),
     path('admin/product/', AdminProductView.as_view()),
+    path('admin/catalog-cache/', CatalogCacheStatsView.as_view()),
+    path('admin/product/export/', ProductExportView.as_view()),
+    path('admin/product/inventory/', AdminInventoryView.as_view()),
 ]
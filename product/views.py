@@ -1,27 +1,49 @@
+from functools import partial
+
 from django.db import transaction
-from django.db.models import F, Sum
+from django.db.models import F, Count, Max, Prefetch
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import ListAPIView, get_object_or_404
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, IsAuthenticatedOrReadOnly
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from product import cache, export
 from product.enums import CartStatusEnum
-from product.models import Category, Product, Cart, CartItem, Comment
-from product.serializers import CategorySerializer, ProductSerializer, CartSerializer, CartItemRequestBodySerializer, \
-    CartItemSerializer, CommentSerializer, UpdateProductsSerializer, CartItemDetailSerializer
-
-
-class CategoriesView(APIView):
+from product.fast_serializers import CategoryValuesSerializer, ProductValuesSerializer, \
+    CartItemDetailValuesSerializer
+from product.favorites import add_favorite, remove_favorite, sync_favorites, get_favorite_ids
+from product.filters import FullTextSearchFilter, ProductFilterSet
+from product.mixins import ConditionalGetMixin
+from product.orders import checkout
+from product.pagination import KeysetPagination
+from product.ratings import add_rating, remove_rating
+from product.stock import reserve_stock, reserve_stocks, adjust_inventory, lock_open_cart
+from product.models import Category, Product, Cart, CartItem, Comment, Order, OrderLine
+from product.serializers import ProductSerializer, CartSerializer, CartItemRequestBodySerializer, \
+    CartItemSerializer, CommentSerializer, UpdateProductsSerializer, \
+    CartBulkRequestBodySerializer, CommentListSerializer, InventoryRequestBodySerializer, \
+    FavoritesSyncRequestBodySerializer, OrderSerializer
+
+
+class CategoriesView(ConditionalGetMixin, APIView):
     permission_classes = [AllowAny]
 
     def get(self, request: Request):
-        categories = Category.objects.all()
-        serializer = CategorySerializer(categories, many=True)
+        get_response = partial(cache.cached_response, request, [Category], self.get_response)
+        return self.conditional_response(request, get_response)
+
+    def get_conditional_queryset(self):
+        return Category.objects.all()
+
+    def get_response(self) -> Response:
+        categories = CategoryValuesSerializer.values(Category.objects.all())
+        serializer = CategoryValuesSerializer(categories, many=True)
         return Response(serializer.data)
 
 
@@ -29,14 +51,14 @@ class CustomPagination(PageNumberPagination):
     page_size_query_param = 'size'
 
 
-class ProductListView(ListAPIView):
+class ProductListView(ConditionalGetMixin, ListAPIView):
     permission_classes = [AllowAny]
     serializer_class = ProductSerializer
+    values_serializer_class = ProductValuesSerializer
     pagination_class = CustomPagination
-    filter_backends = [OrderingFilter, DjangoFilterBackend, SearchFilter]
+    filter_backends = [OrderingFilter, DjangoFilterBackend, FullTextSearchFilter]
     ordering_fields = ('price',)
-    filterset_fields = ['category_id']
-    search_fields = ['title', 'slug']
+    filterset_class = ProductFilterSet
     queryset = Product.objects.all()
 
     def get_serializer_context(self):
@@ -44,16 +66,80 @@ class ProductListView(ListAPIView):
         context['user'] = self.request.user
         return context
 
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        return self.conditional_response(request, partial(super().get, request, *args, **kwargs))
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        if not request.user.is_anonymous:
+            return self.list_values()
+
+        return cache.cached_response(request, [Product], self.list_values)
+
+    def list_values(self) -> Response:
+        # Same output as ListModelMixin.list with serializer_class, built from .values() rows.
+        queryset = self.values_serializer_class.values(self.filter_queryset(self.get_queryset()))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.values_serializer_class(page, many=True, context=self.get_serializer_context())
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.values_serializer_class(queryset, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+
+    def get_conditional_queryset(self):
+        return self.filter_queryset(self.get_queryset())
+
+    def get_fingerprint(self):
+        fingerprint = super().get_fingerprint()
+        user = self.request.user
+
+        if user.is_anonymous:
+            return fingerprint
+
+        # Favorites feed is_user_favorite without touching Product.updated_at.
+        if (favorite_ids := getattr(user, 'favorite_product_ids', None)) is not None:
+            fingerprint['favorites'] = sorted(favorite_ids)
+        else:
+            fingerprint['favorites'] = user.favorite_products.through.objects.filter(user_id=user.id).aggregate(
+                count=Count('pk'),
+                last_id=Max('pk'),
+            )
+
+        return fingerprint
+
+    def get_queryset(self):
+        return Product.objects.with_is_user_favorite(self.request.user)
+
+
+class ProductCursorListView(ProductListView):
+    pagination_class = KeysetPagination
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        # The conditional GET fingerprint aggregates the whole filtered catalog, which is what keyset
+        # pages are meant to avoid.
+        return ListAPIView.get(self, request, *args, **kwargs)
+
+
+class ProductExportView(ProductListView):
+    permission_classes = [IsAdminUser]
+
     def get_queryset(self):
-        queryset = Product.objects.all()
+        return Product.objects.all()
 
-        if min_price := self.request.GET.get('min_price'):
-            queryset = queryset.filter(price__gte=min_price)
+    def get(self, request: Request, *args, **kwargs) -> StreamingHttpResponse | Response:
+        output_format = request.query_params.get('output', 'csv')
+        if output_format not in export.FORMATS:
+            return Response({'message': f'Invalid output {output_format}.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if max_price := self.request.GET.get('max_price'):
-            queryset = queryset.filter(price__lte=max_price)
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+        chunks = export.export_products(self.filter_queryset(self.get_queryset()), output_format, compress=compress)
 
-        return queryset
+        return StreamingHttpResponse(
+            chunks,
+            content_type='application/gzip' if compress else export.CONTENT_TYPES[output_format],
+            headers={'Content-Disposition': f'attachment; filename="{export.get_filename(output_format, compress)}"'},
+        )
 
 
 class FavoriteProductListView(ProductListView):
@@ -68,46 +154,72 @@ class FavoriteProductListView(ProductListView):
 class FavoriteProductDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def post(self, request: Request, product_id: int) -> Response:
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+    def post(self, request: Request, product_id: str) -> Response:
+        if not product_id.isdigit():
             return Response({'message': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        if request.user.favorite_products.filter(id=product_id).exists():
-            return Response({'message': 'Product already exists.'}, status=status.HTTP_400_BAD_REQUEST)
+        if add_favorite(request.user.id, int(product_id)):
+            return Response({'message': 'OK'})
 
-        request.user.favorite_products.add(product)
+        # Nothing inserted: tell a missing product apart from an existing favorite.
+        if not Product.objects.filter(id=product_id).exists():
+            return Response({'message': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({'message': 'OK'})
+        return Response({'message': 'Product already exists.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    def delete(self, request: Request, product_id: int) -> Response:
-        if product := request.user.favorite_products.filter(id=product_id).first():
-            request.user.favorite_products.remove(product)
+    def delete(self, request: Request, product_id: str) -> Response:
+        if product_id.isdigit() and remove_favorite(request.user.id, int(product_id)):
             return Response({'message': 'OK'})
-        else:
-            return Response({'message': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
+        return Response({'message': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-class CartView(APIView):
+
+class FavoriteProductIdsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request: Request) -> Response:
-        # TODO: N+1 Query warning. Fix me later.
-        try:
-            cart = Cart.objects.get(user=request.user, status=CartStatusEnum.OPEN)
-        except Cart.DoesNotExist:
-            serializer = CartSerializer()
-            return Response(serializer.data)
+        return Response({'ids': get_favorite_ids(request.user)})
 
-        queryset = cart.cartitem_set.annotate(
-            price=F('quantity') * F('product__price'),
-        ).aggregate(
-            total_price=Sum('price', default=0),
-            item_counts=Sum('quantity', default=0),
-        )
 
-        serializer = CartSerializer(queryset)
+class FavoriteProductSyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request: Request) -> Response:
+        serializer = FavoritesSyncRequestBodySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        result = sync_favorites(request.user.id, serializer.validated_data['add'], serializer.validated_data['remove'])
+
+        return Response(result)
+
+
+class CartView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def get_cart_items(user):
+        return CartItem.objects.filter(
+            cart__user=user,
+            cart__status=CartStatusEnum.OPEN,
+        ).select_related('product').only(
+            'id', 'quantity', 'product__id', 'product__title', 'product__price', 'product__image',
+        ).order_by('id')
+
+    @staticmethod
+    def summarize(cart_items) -> dict:
+        cart = {'items': [], 'item_counts': 0, 'total_price': 0}
+        for cart_item in cart_items:
+            cart_item.total_price = cart_item.quantity * (cart_item.product.price or 0)
+            cart['items'].append(cart_item)
+            cart['item_counts'] += cart_item.quantity
+            cart['total_price'] += cart_item.total_price
+
+        return cart
+
+    def get(self, request: Request) -> Response:
+        cart = self.summarize(self.get_cart_items(request.user))
+        serializer = CartSerializer(cart, context={'request': request})
 
         return Response(serializer.data)
 
@@ -116,41 +228,142 @@ class CartView(APIView):
         serializer = CartItemRequestBodySerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
 
-        cart, _ = Cart.objects.get_or_create(user=request.user, status=CartStatusEnum.OPEN)
+        cart = lock_open_cart(request.user)
 
         product = serializer.validated_data['product']
         quantity = serializer.validated_data['quantity']
 
-        try:
-            cart_item = CartItem.objects.get(cart=cart, product=product)
-            product.quantity -= quantity
-            product.quantity += cart_item.quantity
-            product.save()
-            cart_item.quantity = quantity
-            cart_item.save()
-        except CartItem.DoesNotExist:
-            cart_item = CartItem.objects.create(cart=cart, product=product, quantity=quantity)
-            product.quantity -= quantity
-            product.save()
+        # Concurrent requests for the same line serialize on its row lock, so the delta is never double-counted.
+        cart_item, _ = CartItem.objects.get_or_create(cart=cart, product=product, defaults={'quantity': 0})
+        cart_item = CartItem.objects.select_for_update().get(id=cart_item.id)
+
+        if not reserve_stock(product.id, quantity - cart_item.quantity):
+            transaction.set_rollback(True)
+            return Response({'message': 'Insufficient stock.'}, status=status.HTTP_409_CONFLICT)
+
+        cart_item.quantity = quantity
+        cart_item.save(update_fields=['quantity'])
+        cart.save(update_fields=['updated_at'])
 
         result_serializer = CartItemSerializer(cart_item)
         return Response(result_serializer.data)
 
 
-class CartItemListView(APIView):
+class CartBulkView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @transaction.atomic
+    def put(self, request: Request) -> Response:
+        serializer = CartBulkRequestBodySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        quantities = {item['product_id']: item['quantity'] for item in serializer.validated_data['items']}
+
+        cart = lock_open_cart(request.user)
+
+        # Make sure every line exists, then lock them all in product order like CartView.put does for one.
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product_id=product_id, quantity=0) for product_id in quantities],
+            ignore_conflicts=True,
+        )
+        cart_items = list(
+            CartItem.objects.select_for_update().filter(cart=cart, product_id__in=quantities).order_by('product_id')
+        )
+
+        deltas = {item.product_id: quantities[item.product_id] - item.quantity for item in cart_items}
+        if (product_id := reserve_stocks(deltas)) is not None:
+            transaction.set_rollback(True)
+            return Response(
+                {'message': f'Insufficient stock for product {product_id}.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        for cart_item in cart_items:
+            cart_item.quantity = quantities[cart_item.product_id]
+
+        CartItem.objects.bulk_update([item for item in cart_items if item.quantity], ['quantity'])
+        CartItem.objects.filter(id__in=[item.id for item in cart_items if not item.quantity]).delete()
+        cart.save(update_fields=['updated_at'])
+
+        result_serializer = CartItemSerializer(cart.cartitem_set.order_by('id'), many=True)
+        return Response(result_serializer.data)
+
+
+class CheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @transaction.atomic
+    def post(self, request: Request) -> Response:
+        if (order := checkout(request.user)) is None:
+            transaction.set_rollback(True)
+            return Response({'message': 'Cart is empty.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        order = Order.objects.prefetch_related(Prefetch('lines', OrderLine.objects.order_by('id'))).get(id=order.id)
+        return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
+
+
+class OrderPagination(CustomPagination):
+    page_size = 20
+    max_page_size = 100
+
+
+class OrderListView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = OrderSerializer
+    pagination_class = OrderPagination
+
+    def get_queryset(self):
+        # Totals were stored at checkout, so history never joins the live product prices.
+        return Order.objects.filter(user=self.request.user).prefetch_related(
+            Prefetch('lines', OrderLine.objects.order_by('id'))
+        ).order_by('-created_at', '-id')
+
+
+class CartItemListView(ConditionalGetMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    last_modified_field = 'product__updated_at'
+
     def get(self, request: Request, cart_id: int) -> Response:
-        cart = get_object_or_404(Cart.objects, user=request.user, id=cart_id)
+        return self.conditional_response(request, self.get_response)
+
+    def get_conditional_queryset(self):
+        return CartItem.objects.filter(cart__user=self.request.user, cart_id=self.kwargs['cart_id'])
+
+    def get_response(self) -> Response:
+        cart = get_object_or_404(Cart.objects, user=self.request.user, id=self.kwargs['cart_id'])
         queryset = cart.cartitem_set.annotate(
             total_price=F('quantity') * F('product__price')
         )
-        serializer = CartItemDetailSerializer(queryset, many=True)
+        serializer = CartItemDetailValuesSerializer(CartItemDetailValuesSerializer.values(queryset), many=True)
         return Response(serializer.data)
 
 
-class CommentView(APIView):
-    permission_classes = [IsAuthenticated]
+class CommentView(ListAPIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    serializer_class = CommentListSerializer
+    pagination_class = KeysetPagination
+    ordering = '-created_at'
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        if KeysetPagination.cursor_query_param in request.query_params:
+            return self.list_comments(request, *args, **kwargs)
+
+        scopes = [cache.comments_scope(self.kwargs['product_id'])]
+        return cache.cached_response(request, scopes, partial(self.list_comments, request, *args, **kwargs))
+
+    def list_comments(self, request: Request, *args, **kwargs) -> Response:
+        response = super().list(request, *args, **kwargs)
+
+        # A product with comments exists, so only an empty page needs the extra lookup.
+        if not response.data['results'] and not Product.objects.filter(id=self.kwargs['product_id']).exists():
+            return Response({'message': 'Product not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        return response
+
+    def get_queryset(self):
+        return Comment.objects.filter(product_id=self.kwargs['product_id']).select_related('user').only(
+            'id', 'rate', 'content', 'created_at', 'user__id', 'user__username',
+        )
 
     def post(self, request: Request, product_id: int) -> Response:
         try:
@@ -163,12 +376,14 @@ class CommentView(APIView):
         if not serializer.is_valid():
             return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-        comment = Comment.objects.create(
-            product=product,
-            user=request.user,
-            rate=serializer.validated_data['rate'],
-            content=serializer.validated_data['content']
-        )
+        with transaction.atomic():
+            comment = Comment.objects.create(
+                product=product,
+                user=request.user,
+                rate=serializer.validated_data['rate'],
+                content=serializer.validated_data['content']
+            )
+            add_rating(product.id, comment.rate)
 
         res_serializer = CommentSerializer(comment)
         return Response(res_serializer.data)
@@ -184,7 +399,12 @@ class CommentView(APIView):
         except Comment.DoesNotExist:
             return Response({'message': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-        comment.delete()
+        with transaction.atomic():
+            # A concurrent delete of the same comment must not decrement the aggregates twice.
+            deleted, _ = comment.delete()
+            if deleted:
+                remove_rating(product.id, comment.rate)
+
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -200,6 +420,34 @@ class AdminProductView(APIView):
 
         products = Product.objects.filter(id__in=product_ids)
         products.update(quantity=0)
+        cache.bump_version(Product)
+        products = products.with_is_user_favorite(request.user)
 
         res_serializer = ProductSerializer(products, many=True, context={'user': request.user})
         return Response(res_serializer.data, status=status.HTTP_200_OK)
+
+
+class AdminInventoryView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @transaction.atomic
+    def patch(self, request: Request) -> Response:
+        serializer = InventoryRequestBodySerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        rows, errors = adjust_inventory(serializer.validated_data['changes'])
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': [
+                {'id': product_id, 'quantity': quantity, 'price': price} for product_id, quantity, price in rows
+            ],
+        })
+
+
+class CatalogCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request) -> Response:
+        return Response(cache.get_stats())
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shoppy_zone.settings')
+# Under ASGI every request runs its sync code in a new thread, so persistent connections would pile up
+# instead of being reused. Close them per request unless DB_CONN_MAX_AGE is set explicitly.
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
@@ -0,0 +1,161 @@
+import threading
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+# Upper bounds in seconds; the last bucket is +Inf.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; percentiles are interpolated inside the bucket that holds them."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, fraction: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+
+        return self.max
+
+    def cumulative_counts(self) -> list[tuple[str, int]]:
+        """`(le, count)` pairs as in the Prometheus text format."""
+        pairs, total = [], 0
+        for bound, count in zip([*map(str, self.buckets), '+Inf'], self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def summary(self, scale: float = 1000) -> dict:
+        return {
+            'mean': round(self.sum / self.count * scale, 3) if self.count else 0.0,
+            'p50': round(self.percentile(0.50) * scale, 3),
+            'p95': round(self.percentile(0.95) * scale, 3),
+            'p99': round(self.percentile(0.99) * scale, 3),
+            'max': round(self.max * scale, 3),
+        }
+
+
+@dataclass
+class EndpointStats:
+    latency: Histogram = field(default_factory=Histogram)
+    db: Histogram = field(default_factory=Histogram)
+    serialize: Histogram = field(default_factory=Histogram)
+    queries: int = 0
+    max_queries: int = 0
+    errors: int = 0
+    duplicate_query_requests: int = 0
+
+
+@dataclass
+class RequestMetrics:
+    latency: float
+    db: float
+    serialize: float
+    queries: int
+    status_code: int
+    duplicate_queries: int = 0
+
+
+class Registry:
+    """Per-process stats keyed by `(method, route)`; each worker process reports its own numbers."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints: dict[tuple[str, str], EndpointStats] = {}
+
+    def record(self, method: str, route: str, metrics: RequestMetrics) -> None:
+        with self.lock:
+            stats = self.endpoints.setdefault((method, route), EndpointStats())
+            stats.latency.observe(metrics.latency)
+            stats.db.observe(metrics.db)
+            stats.serialize.observe(metrics.serialize)
+            stats.queries += metrics.queries
+            stats.max_queries = max(stats.max_queries, metrics.queries)
+            stats.errors += metrics.status_code >= 500
+            stats.duplicate_query_requests += bool(metrics.duplicate_queries)
+
+    def snapshot(self) -> list[dict]:
+        with self.lock:
+            return [
+                {
+                    'method': method,
+                    'route': route,
+                    'count': stats.latency.count,
+                    'errors': stats.errors,
+                    'queries': {
+                        'total': stats.queries,
+                        'mean': round(stats.queries / stats.latency.count, 2),
+                        'max': stats.max_queries,
+                    },
+                    'duplicate_query_requests': stats.duplicate_query_requests,
+                    'latency_ms': stats.latency.summary(),
+                    'db_ms': stats.db.summary(),
+                    'serialize_ms': stats.serialize.summary(),
+                }
+                for (method, route), stats in sorted(self.endpoints.items(), key=lambda item: item[0][::-1])
+            ]
+
+    def to_prometheus(self) -> str:
+        histograms = (
+            ('latency', 'shoppy_request_duration_seconds', 'Request latency.'),
+            ('db', 'shoppy_request_db_seconds', 'Time spent in SQL per request.'),
+            ('serialize', 'shoppy_request_serialize_seconds', 'Time spent rendering the response body.'),
+        )
+        counters = (
+            ('queries', 'shoppy_request_queries_total', 'SQL queries executed.'),
+            ('errors', 'shoppy_request_errors_total', 'Responses with a 5xx status.'),
+            ('duplicate_query_requests', 'shoppy_request_duplicate_queries_total', 'Requests that repeated a query.'),
+        )
+
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+            lines = []
+
+            for attribute, name, description in histograms:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (method, route), stats in endpoints:
+                    histogram = getattr(stats, attribute)
+                    labels = f'method="{method}",route="{escape_label(route)}"'
+                    lines += [
+                        f'{name}_bucket{{{labels},le="{le}"}} {count}' for le, count in histogram.cumulative_counts()
+                    ]
+                    lines += [f'{name}_sum{{{labels}}} {histogram.sum}', f'{name}_count{{{labels}}} {histogram.count}']
+
+            for attribute, name, description in counters:
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+                for (method, route), stats in endpoints:
+                    labels = f'method="{method}",route="{escape_label(route)}"'
+                    lines.append(f'{name}{{{labels}}} {getattr(stats, attribute)}')
+
+        return '\n'.join(lines) + '\n'
+
+    def reset(self) -> None:
+        with self.lock:
+            self.endpoints.clear()
+
+
+def escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
@@ -0,0 +1,155 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from shoppy_zone.metrics import RequestMetrics, registry
+from shoppy_zone.routers import replica_scope
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """`execute_wrapper` that counts queries and their time; with `track_sql`, also counts each SQL template."""
+
+    def __init__(self, track_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter() if track_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if self.statements is not None:
+                self.statements[sql] += 1
+
+
+class InstrumentationMiddleware:
+    """
+    Record per-endpoint SQL query count, DB time, render time and total latency into `shoppy_zone.metrics`
+    and report them in a `Server-Timing` header.
+
+    `serialize` is the time DRF spends rendering the response; building `serializer.data` inside the view
+    is part of the remaining `app` time. With `METRICS_DETECT_DUPLICATE_QUERIES` (on in DEBUG), SQL run
+    `METRICS_DUPLICATE_QUERY_THRESHOLD` times or more in one request is logged as a likely N+1.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = self.start(request)
+        started = time.perf_counter()
+        with self.record_queries(recorder):
+            response = self.get_response(request)
+
+        return self.finish(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        recorder = self.start(request)
+        started = time.perf_counter()
+        # Async views run their queries on the request's thread-sensitive executor thread, and execute
+        # wrappers are per thread, so install and remove them there.
+        stack = await sync_to_async(self.record_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+
+        return self.finish(request, response, recorder, started)
+
+    @staticmethod
+    def start(request) -> QueryRecorder:
+        request._render_started = None
+        return QueryRecorder(track_sql=getattr(settings, 'METRICS_DETECT_DUPLICATE_QUERIES', settings.DEBUG))
+
+    @staticmethod
+    def record_queries(recorder: QueryRecorder) -> ExitStack:
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def finish(self, request, response, recorder: QueryRecorder, started: float):
+        finished = time.perf_counter()
+
+        serialize = finished - request._render_started if request._render_started is not None else 0.0
+        metrics = RequestMetrics(
+            latency=finished - started,
+            db=recorder.duration,
+            serialize=serialize,
+            queries=recorder.count,
+            status_code=response.status_code,
+        )
+
+        if recorder.statements is not None:
+            metrics.duplicate_queries = self.report_duplicates(request, recorder.statements)
+
+        registry.record(request.method, self.get_route(request), metrics)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db * 1000:.2f};desc="{metrics.queries} queries"',
+            f'serialize;dur={metrics.serialize * 1000:.2f}',
+            f'app;dur={(metrics.latency - metrics.db - metrics.serialize) * 1000:.2f}',
+            f'total;dur={metrics.latency * 1000:.2f}',
+        ])
+
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs right before DRF renders the Response, so the rest of the request is render time.
+        request._render_started = time.perf_counter()
+        return response
+
+    @staticmethod
+    def get_route(request) -> str:
+        match = getattr(request, 'resolver_match', None)
+        return match.route if match is not None else '<unmatched>'
+
+    @staticmethod
+    def report_duplicates(request, statements: Counter) -> int:
+        threshold = getattr(settings, 'METRICS_DUPLICATE_QUERY_THRESHOLD', 3)
+        duplicates = {sql: count for sql, count in statements.items() if count >= threshold}
+
+        for sql, count in duplicates.items():
+            logger.warning('Possible N+1 on %s %s: query ran %d times: %s', request.method, request.path, count, sql)
+
+        return sum(duplicates.values())
+
+
+class ReplicaRoutingMiddleware:
+    """Let `ReplicaRouter` send this request's catalog reads to a replica until it writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with replica_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        # sync_to_async copies the context, so queries run in executor threads share this request's state.
+        with replica_scope():
+            return await self.get_response(request)
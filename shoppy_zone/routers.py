@@ -0,0 +1,67 @@
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_request_state: ContextVar[dict | None] = ContextVar('replica_request_state', default=None)
+_counter = itertools.count()
+
+
+@contextmanager
+def replica_scope():
+    """
+    Allow catalog reads to go to a replica until the scope performs its first write.
+    `ReplicaRoutingMiddleware` opens one per request; code outside a scope always uses the primary.
+    """
+    token = _request_state.set({'replica': None, 'pinned': False})
+    try:
+        yield
+    finally:
+        _request_state.reset(token)
+
+
+def used_replica() -> bool:
+    """Whether the current request has read from a replica."""
+    state = _request_state.get()
+    return state is not None and state['replica'] is not None
+
+
+class ReplicaRouter:
+    """
+    Route catalog reads to the aliases in `DATABASE_REPLICAS`, one replica per request picked round-robin.
+
+    A request is pinned to the primary after any write (including `select_for_update` and `get_or_create`),
+    and reads inside a transaction on the primary stay there, so a request always sees its own writes.
+    """
+    replica_models = {'product.category', 'product.product', 'product.comment'}
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+
+        if state is None or state['pinned'] or not replicas or model._meta.label_lower not in self.replica_models:
+            return None
+
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        if state['replica'] is None:
+            state['replica'] = replicas[next(_counter) % len(replicas)]
+
+        return state['replica']
+
+    def db_for_write(self, model, **hints):
+        if (state := _request_state.get()) is not None:
+            state['pinned'] = True
+        # Returning None would fall back to the instance's own database, which is a replica for rows read there.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        return False if db in getattr(settings, 'DATABASE_REPLICAS', []) else None
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -35,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'django_filters',
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'shoppy_zone.middleware.InstrumentationMiddleware',
+    'shoppy_zone.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -87,12 +91,66 @@ DATABASES = {
         'PASSWORD': 'postgres',
         'HOST': '127.0.0.1',
         'PORT': '5432',
+        # Persistent connections: each worker thread keeps its connection for DB_CONN_MAX_AGE seconds
+        # (0 closes it after every request) and pings it before reusing it in a new request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() == 'true',
+        # Required behind a transaction-pooling PgBouncer, which can't keep server-side cursors open.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS', 'false').lower() == 'true',
     }
 }
 
+# Read replicas as comma-separated host[:port] values; catalog reads are spread over them by
+# shoppy_zone.routers.ReplicaRouter. Tests run them as mirrors of the default test database.
+DATABASE_REPLICAS = []
+
+for index, address in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = address.strip().partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{index}')
+
+DATABASE_ROUTERS = ['shoppy_zone.routers.ReplicaRouter']
+
+# Seconds a replica may trail the primary; catalog pages read from a replica this soon after a write
+# are served but not cached.
+DATABASE_REPLICA_MAX_LAG = int(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+if REDIS_URL := os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+CATALOG_CACHE_TIMEOUT = 60 * 5
+USER_CACHE_TIMEOUT = 60 * 5
+
+# Open carts left unchanged for this many seconds are deleted and their stock released by
+# `manage.py release_abandoned_carts`.
+ABANDONED_CART_TTL = int(os.environ.get('ABANDONED_CART_TTL', 60 * 60 * 24))
+
+# Request instrumentation, see shoppy_zone.middleware.
+METRICS_DETECT_DUPLICATE_QUERIES = DEBUG
+METRICS_DUPLICATE_QUERY_THRESHOLD = 3
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'account.authentication.CachedJWTAuthentication',
     )
 }
 
@@ -138,6 +196,10 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 MEDIA_URL = 'media/'
 
+# WebP derivatives generated for Product.image and Category.icon; 0 workers renders them inline.
+THUMBNAIL_WIDTHS = [160, 320, 640]
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,205 @@
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache as django_cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from account.models import User
+from product.enums import ProductUnitEnum
+from product.models import Category, Product
+from shoppy_zone.metrics import Histogram, registry
+from shoppy_zone.middleware import InstrumentationMiddleware
+from shoppy_zone.routers import replica_scope
+
+
+class HistogramTest(APITestCase):
+    def test_percentiles(self):
+        histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+        for value in [0.005] * 50 + [0.05] * 45 + [0.5] * 5:
+            histogram.observe(value)
+
+        self.assertAlmostEqual(histogram.percentile(0.50), 0.01)
+        self.assertAlmostEqual(histogram.percentile(0.95), 0.1)
+        self.assertAlmostEqual(histogram.percentile(0.99), 0.5)
+        self.assertEqual(histogram.cumulative_counts(), [('0.01', 50), ('0.1', 95), ('1.0', 100), ('+Inf', 100)])
+
+
+class InstrumentationMiddlewareTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin', password='password')
+        Category.objects.create(title='Fruits', icon='category/icon.png', description='')
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_server_timing_and_stats(self):
+        response = self.client.get('/api/shop/categories/')
+
+        timings = dict(part.split(';', 1) for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(timings), {'db', 'serialize', 'app', 'total'})
+
+        self.client.force_authenticate(self.admin)
+        endpoints = {
+            (item['method'], item['route']): item for item in self.client.get('/api/metrics/').data['endpoints']
+        }
+
+        stats = endpoints['GET', 'api/shop/categories/']
+        self.assertEqual(stats['count'], 1)
+        self.assertGreater(stats['queries']['total'], 0)
+        self.assertEqual(set(stats['latency_ms']), {'mean', 'p50', 'p95', 'p99', 'max'})
+
+    def test_prometheus_format(self):
+        self.client.get('/api/shop/categories/')
+        self.client.force_authenticate(self.admin)
+
+        response = self.client.get('/api/metrics/', {'format': 'prometheus'})
+
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('# TYPE shoppy_request_duration_seconds histogram', body)
+        self.assertIn('shoppy_request_duration_seconds_count{method="GET",route="api/shop/categories/"} 1', body)
+
+    def test_metrics_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+
+    @override_settings(METRICS_DETECT_DUPLICATE_QUERIES=True, METRICS_DUPLICATE_QUERY_THRESHOLD=3)
+    def test_repeated_queries_are_flagged(self):
+        def get_response(request):
+            for _ in range(3):
+                list(Category.objects.filter(title='Fruits'))
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        with self.assertLogs('shoppy_zone.middleware', 'WARNING') as logs:
+            middleware(RequestFactory().get('/'))
+
+        self.assertIn('query ran 3 times', logs.output[0])
+        self.assertEqual(registry.snapshot()[0]['duplicate_query_requests'], 1)
+
+
+class AsyncMiddlewareTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(title='Fruits', icon='category/icon.png', description='')
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        django_cache.clear()
+
+    @override_settings(DEBUG=True)
+    def test_asgi_stack_is_not_adapted_to_sync(self):
+        # In DEBUG, BaseHandler logs every middleware it has to wrap in async_to_sync/sync_to_async.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            handler = ASGIHandler()
+
+        self.assertTrue(iscoroutinefunction(handler._middleware_chain))
+
+    async def test_async_route_through_asgi_handler(self):
+        response = await self.async_client.get('/api/async/shop/categories/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        stats = {(item['method'], item['route']): item for item in registry.snapshot()}
+        self.assertEqual(stats['GET', 'api/async/shop/categories/']['queries']['total'], 1)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(APITransactionTestCase):
+    """The replica is simulated by a second alias with its own connection to the test database."""
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings['replica'] = {**connections['default'].settings_dict}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        super().setUp()
+        django_cache.clear()
+        self.user = User.objects.create_user(username='user', password='password')
+        category = Category.objects.create(title='Fruits', icon='', description='')
+        self.product = Product.objects.create(
+            title='Apple', slug='apple', description='', image='', price=100, unit=ProductUnitEnum.ONE,
+            quantity=10, category=category,
+        )
+
+    def test_catalog_reads_go_to_the_replica(self):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get('/api/shop/products/')
+
+        self.assertEqual(response.data[0]['title'], 'Apple')
+        self.assertGreater(len(replica), 0)
+        self.assertEqual(len(primary), 0)
+
+    def test_replica_pages_are_not_cached_right_after_a_write(self):
+        # setUp just wrote the product, so the replica may still be serving the rows from before it.
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'MISS')
+
+        # Once the lag window is over, replica reads fill the cache again.
+        django_cache.delete('catalog:bumped:product.product')
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'HIT')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_primary_pages_are_cached_right_after_a_write(self):
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/shop/products/')['X-Cache'], 'HIT')
+
+    def test_outside_a_request_everything_uses_the_primary(self):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            Product.objects.count()
+
+        self.assertEqual(len(replica), 0)
+
+    def test_reads_after_a_write_are_pinned_to_the_primary(self):
+        with replica_scope():
+            with CaptureQueriesContext(connections['replica']) as replica:
+                Product.objects.count()
+                Category.objects.create(title='Herbs', icon='', description='')
+                Category.objects.count()
+                Product.objects.count()
+
+        self.assertEqual(len(replica), 1)
+
+    def test_reads_in_a_transaction_use_the_primary(self):
+        with replica_scope(), transaction.atomic():
+            self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_writes_never_reach_the_replica(self):
+        self.client.force_authenticate(self.user)
+        url = f'/api/shop/products/{self.product.id}/comment/'
+
+        with CaptureQueriesContext(connections['replica']) as replica:
+            self.client.get('/api/shop/products/')
+            self.assertEqual(self.client.post(url, {'rate': 4, 'content': 'Fresh'}).status_code, 200)
+            # Loads the comment outside a transaction, so from the replica, before deleting it.
+            self.assertEqual(self.client.delete(url).status_code, 204)
+            self.client.put('/api/shop/products/cart/', {'product_id': self.product.id, 'quantity': 1})
+
+        self.assertGreater(len(replica), 0)
+        statements = [query['sql'].split()[0] for query in replica]
+        self.assertFalse({'INSERT', 'UPDATE', 'DELETE'} & set(statements), statements)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).rate_count, 0)
+
+    def test_cart_put_reads_its_own_writes(self):
+        self.client.force_authenticate(self.user)
+
+        response = self.client.put('/api/shop/products/cart/', {'product_id': self.product.id, 'quantity': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).quantity, 8)
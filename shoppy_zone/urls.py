@@ -19,10 +19,14 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from shoppy_zone.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/account/', include('account.urls')),
     path('api/shop/', include('product.urls')),
+    path('api/async/shop/', include('product.async_urls')),
+    path('api/metrics/', MetricsView.as_view()),
 ]
 
 if settings.DEBUG:
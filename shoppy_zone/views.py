@@ -0,0 +1,32 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from shoppy_zone.metrics import registry
+
+
+class PrometheusRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, dict) and 'endpoints' in data:
+            return registry.to_prometheus()
+        # Errors such as 403 keep their JSON body.
+        return JSONRenderer().render(data).decode()
+
+
+class MetricsView(APIView):
+    """Per-endpoint request stats of this process, as JSON or, with `?format=prometheus`, Prometheus text."""
+    permission_classes = [IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    def get(self, request: Request) -> Response:
+        return Response({'endpoints': registry.snapshot()})
+
+    def delete(self, request: Request) -> Response:
+        registry.reset()
+        return Response({'message': 'OK'})